@@ -119,7 +119,7 @@ def find_patient(phone: str = None, email: str = None,
                 "phone": patient.phone,
                 "email": patient.email,
                 "insurance_provider": patient.insurance_provider,
-                "status": patient.status.value
+                "status": patient.status.label
             })
         
         return {
@@ -365,7 +365,7 @@ def get_patient_appointments(patient_id: str, upcoming_only: bool = True) -> dic
                 "appointment_id": appointment.id,
                 "doctor_name": f"Dr. {doctor.first_name} {doctor.last_name}" if doctor else "Unknown",
                 "appointment_datetime": appointment.appointment_datetime.strftime("%Y-%m-%d %H:%M"),
-                "status": appointment.status.value,
+                "status": appointment.status.label,
                 "appointment_type": appointment.appointment_type,
                 "notes": appointment.notes
             })
@@ -39,7 +39,7 @@ class AnalyticsService:
         # Status breakdown
         status_counts = {}
         for status in AppointmentStatus:
-            status_counts[status.value] = sum(1 for a in appointments if a.status == status)
+            status_counts[status.label] = sum(1 for a in appointments if a.status == status)
         
         # Calculate rates
         completed = status_counts.get('completed', 0)
@@ -162,7 +162,7 @@ class AnalyticsService:
         # Patient status breakdown
         status_counts = {}
         for status in PatientStatus:
-            status_counts[status.value] = sum(1 for p in patients if p.status == status)
+            status_counts[status.label] = sum(1 for p in patients if p.status == status)
         
         # Communication preferences
         communication_preferences = {}
@@ -173,7 +173,7 @@ class AnalyticsService:
         # Insurance status breakdown
         insurance_status_counts = {}
         for patient in patients:
-            status = patient.insurance_status.value
+            status = patient.insurance_status.label
             insurance_status_counts[status] = insurance_status_counts.get(status, 0) + 1
         
         # Patient retention analysis
@@ -1,15 +1,26 @@
 """
 Database management for the Medical Appointment Scheduling AI Agent
 """
+import hashlib
 import json
 import os
-from datetime import datetime, timedelta
-from typing import List, Optional, Dict, Any
+import time
+from bisect import bisect_left, bisect_right, insort
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Dict, Any, Iterable, Iterator, Sequence, Tuple
+import numpy as np
 from models import (
     Patient, Doctor, Appointment, NoShowPrediction, ClinicSettings,
     AppointmentStatus, PatientStatus, InsuranceStatus
 )
 
+_ACTIVE_STATUSES = frozenset({AppointmentStatus.SCHEDULED, AppointmentStatus.CONFIRMED})
+_ACTIVE_STATUS_LABELS = frozenset(status.label for status in _ACTIVE_STATUSES)
+
+# A file modified this recently may be rewritten again within the same timestamp
+# tick, so its (mtime, size) alone cannot vouch for its contents
+_RACY_WINDOW_NS = 1_000_000_000
+
 
 class MedicalDatabase:
     """Simple file-based database for the medical appointment system"""
@@ -22,6 +33,43 @@ class MedicalDatabase:
         self.predictions_file = os.path.join(data_dir, "no_show_predictions.json")
         self.settings_file = os.path.join(data_dir, "clinic_settings.json")
         
+        # Monotonic counter bumped by settings writes, for caches of the clinic settings
+        self.settings_version = 0
+        
+        # Reverse indices over the appointments file, rebuilt lazily whenever the
+        # file changes on disk. They hold positions into the cached record list.
+        self._appts_index_key = None
+        self._appt_records: List[Dict] = []
+        self._appts_by_id: Dict[str, int] = {}
+        self._appts_by_patient: Dict[str, List[int]] = {}
+        self._appts_by_status: Dict[AppointmentStatus, List[int]] = {}
+        # Parsed datetime per position, plus positions sorted by datetime with
+        # the matching sorted datetimes for bisecting date windows
+        self._appt_datetimes: List[datetime] = []
+        self._appts_sorted_by_dt: List[int] = []
+        self._appts_by_patient_sorted: Dict[str, List[int]] = {}
+        self._appt_dts_by_patient: Dict[str, List[datetime]] = {}
+        self._appts_by_doctor_day: Dict[Tuple[str, date], List[int]] = {}
+        self._appt_dts: List[datetime] = []
+        # Status codes packed as uint8, aligned with _appts_sorted_by_dt
+        self._status_arr: np.ndarray = np.zeros(0, dtype=np.uint8)
+        
+        # Lookup indices over the patients file for find_patients and the high-risk
+        # list, rebuilt the same way; names are keyed lower-cased so queries need
+        # no per-record lowering
+        self._patients_index_key = None
+        self._patient_records: List[Dict] = []
+        self._patients_by_phone: Dict[str, List[int]] = {}
+        self._patients_by_email: Dict[str, List[int]] = {}
+        self._patients_by_first_name: Dict[str, List[int]] = {}
+        self._patients_by_last_name: Dict[str, List[int]] = {}
+        self._high_risk_patient_positions: List[int] = []
+        
+        # Per file: the (mtime, size) last seen, the key built for it, and whether
+        # that observation came after the racy window so the key can be reused
+        # without reading the file again
+        self._file_keys: Dict[str, Tuple[Tuple[int, int], Tuple, bool]] = {}
+        
         # Create data directory if it doesn't exist
         os.makedirs(data_dir, exist_ok=True)
         
@@ -56,6 +104,115 @@ class MedicalDatabase:
         with open(file_path, 'w') as f:
             json.dump(data, f, indent=2)
     
+    def _file_key(self, file_path: str) -> Optional[Tuple[int, int, bytes]]:
+        """(mtime, size, content digest) of a data file, used to tell whether an index is stale
+        
+        A same-size rewrite inside one timestamp tick leaves mtime and size unchanged,
+        so the file is hashed until it has been seen with an mtime older than
+        _RACY_WINDOW_NS; after that its key is reused until the stat changes.
+        """
+        try:
+            stat = os.stat(file_path)
+        except FileNotFoundError:
+            self._file_keys.pop(file_path, None)
+            return None
+        
+        stat_key = (stat.st_mtime_ns, stat.st_size)
+        seen = self._file_keys.get(file_path)
+        if seen is not None and seen[0] == stat_key and seen[2]:
+            return seen[1]
+        
+        settled = time.time_ns() - stat.st_mtime_ns >= _RACY_WINDOW_NS
+        try:
+            with open(file_path, 'rb') as f:
+                digest = hashlib.blake2b(f.read(), digest_size=16).digest()
+        except FileNotFoundError:
+            self._file_keys.pop(file_path, None)
+            return None
+        key = stat_key + (digest,)
+        self._file_keys[file_path] = (stat_key, key, settled)
+        return key
+    
+    def appointments_stamp(self) -> Optional[Tuple[int, int, bytes]]:
+        """(mtime, size, digest) of the appointments file, which changes on any write to it
+        from this instance, another instance or another process"""
+        return self._file_key(self.appointments_file)
+    
+    def doctors_stamp(self) -> Optional[Tuple[int, int, bytes]]:
+        """(mtime, size, digest) of the doctors file, with the same meaning as appointments_stamp"""
+        return self._file_key(self.doctors_file)
+    
+    def _appointment_index(self) -> List[Dict]:
+        """Rebuild the appointment indices if the file changed and return the raw records"""
+        key = self._file_key(self.appointments_file)
+        
+        if key is None or key != self._appts_index_key:
+            records = self._load_json(self.appointments_file)
+            by_id = {}
+            by_patient = {}
+            by_status = {status: [] for status in AppointmentStatus}
+            for position, appointment_data in enumerate(records):
+                by_id.setdefault(appointment_data['id'], position)
+                by_patient.setdefault(appointment_data['patient_id'], []).append(position)
+                by_status[AppointmentStatus.from_label(appointment_data['status'])].append(position)
+            
+            self._appt_records = records
+            self._appts_by_id = by_id
+            self._appts_by_patient = by_patient
+            self._appts_by_status = by_status
+            
+            datetimes = [datetime.fromisoformat(r['appointment_datetime']) for r in records]
+            sorted_positions = sorted(range(len(records)), key=datetimes.__getitem__)
+            self._appt_datetimes = datetimes
+            self._appts_sorted_by_dt = sorted_positions
+            self._appt_dts = [datetimes[position] for position in sorted_positions]
+            by_patient_sorted = {}
+            dts_by_patient = {}
+            by_doctor_day = {}
+            for position in sorted_positions:
+                appointment_data = records[position]
+                by_patient_sorted.setdefault(appointment_data['patient_id'], []).append(position)
+                dts_by_patient.setdefault(appointment_data['patient_id'], []).append(datetimes[position])
+                by_doctor_day.setdefault(
+                    (appointment_data['doctor_id'], datetimes[position].date()), []
+                ).append(position)
+            self._appts_by_patient_sorted = by_patient_sorted
+            self._appt_dts_by_patient = dts_by_patient
+            self._appts_by_doctor_day = by_doctor_day
+            self._status_arr = np.array(
+                [AppointmentStatus.from_label(records[position]['status']) for position in sorted_positions],
+                dtype=np.uint8
+            )
+            self._appts_index_key = key
+        
+        return self._appt_records
+    
+    def _patient_index(self) -> List[Dict]:
+        """Rebuild the patient lookup indices if the file changed and return the raw records"""
+        key = self._file_key(self.patients_file)
+        
+        if key is None or key != self._patients_index_key:
+            records = self._load_json(self.patients_file)
+            by_phone, by_email, by_first_name, by_last_name = {}, {}, {}, {}
+            high_risk = []
+            for position, patient_data in enumerate(records):
+                if PatientStatus.from_label(patient_data['status']) == PatientStatus.HIGH_RISK:
+                    high_risk.append(position)
+                by_phone.setdefault(patient_data['phone'], []).append(position)
+                by_email.setdefault(patient_data['email'], []).append(position)
+                by_first_name.setdefault(patient_data['first_name'].lower(), []).append(position)
+                by_last_name.setdefault(patient_data['last_name'].lower(), []).append(position)
+            
+            self._patient_records = records
+            self._patients_by_phone = by_phone
+            self._patients_by_email = by_email
+            self._patients_by_first_name = by_first_name
+            self._patients_by_last_name = by_last_name
+            self._high_risk_patient_positions = high_risk
+            self._patients_index_key = key
+        
+        return self._patient_records
+    
     # Patient Management
     def add_patient(self, patient: Patient) -> bool:
         """Add a new patient to the database"""
@@ -67,6 +224,7 @@ class MedicalDatabase:
         
         patients.append(patient.to_dict())
         self._save_json(self.patients_file, patients)
+        self._patients_index_key = None
         return True
     
     def get_patient(self, patient_id: str) -> Optional[Patient]:
@@ -82,6 +240,45 @@ class MedicalDatabase:
         patients = self._load_json(self.patients_file)
         return [self._dict_to_patient(p) for p in patients]
     
+    def get_patients_by_ids(self, patient_ids: Iterable[str]) -> Dict[str, Patient]:
+        """Get several patients in one load, keyed by patient ID"""
+        wanted = set(patient_ids)
+        return {
+            p['id']: self._dict_to_patient(p)
+            for p in self._load_json(self.patients_file)
+            if p['id'] in wanted
+        }
+    
+    def find_patients(self, phone: Optional[str] = None, email: Optional[str] = None,
+                      first_name: Optional[str] = None, last_name: Optional[str] = None) -> List[Patient]:
+        """Patients matching every given criterion (names case-insensitive), in file order"""
+        records = self._patient_index()
+        first_key = first_name.lower() if first_name else None
+        last_key = last_name.lower() if last_name else None
+        
+        # Start from the smallest index bucket, then check the remaining criteria
+        buckets = []
+        if phone:
+            buckets.append(self._patients_by_phone.get(phone, []))
+        if email:
+            buckets.append(self._patients_by_email.get(email, []))
+        if first_key:
+            buckets.append(self._patients_by_first_name.get(first_key, []))
+        if last_key:
+            buckets.append(self._patients_by_last_name.get(last_key, []))
+        if not buckets:
+            return [self._dict_to_patient(p) for p in records]
+        
+        matches = []
+        for position in min(buckets, key=len):
+            patient_data = records[position]
+            if ((not phone or patient_data['phone'] == phone) and
+                (not email or patient_data['email'] == email) and
+                (not first_key or patient_data['first_name'].lower() == first_key) and
+                (not last_key or patient_data['last_name'].lower() == last_key)):
+                matches.append(self._dict_to_patient(patient_data))
+        return matches
+    
     def update_patient(self, patient: Patient) -> bool:
         """Update patient information"""
         patients = self._load_json(self.patients_file)
@@ -89,6 +286,7 @@ class MedicalDatabase:
             if p['id'] == patient.id:
                 patients[i] = patient.to_dict()
                 self._save_json(self.patients_file, patients)
+                self._patients_index_key = None
                 return True
         return False
     
@@ -105,8 +303,8 @@ class MedicalDatabase:
             emergency_contact=data['emergency_contact'],
             insurance_provider=data['insurance_provider'],
             insurance_number=data['insurance_number'],
-            insurance_status=InsuranceStatus(data['insurance_status']),
-            status=PatientStatus(data['status']),
+            insurance_status=InsuranceStatus.from_label(data['insurance_status']),
+            status=PatientStatus.from_label(data['status']),
             no_show_count=data['no_show_count'],
             last_appointment=datetime.fromisoformat(data['last_appointment']) if data['last_appointment'] else None,
             preferred_communication=data['preferred_communication'],
@@ -126,6 +324,24 @@ class MedicalDatabase:
         self._save_json(self.doctors_file, doctors)
         return True
     
+    def add_doctors_bulk(self, new_doctors: List[Doctor]) -> List[bool]:
+        """Add several doctors with a single file write, returning whether each was added"""
+        doctors = self._load_json(self.doctors_file)
+        known_ids = {d['id'] for d in doctors}
+        
+        added = []
+        for doctor in new_doctors:
+            if doctor.id in known_ids:
+                added.append(False)
+                continue
+            known_ids.add(doctor.id)
+            doctors.append(doctor.to_dict())
+            added.append(True)
+        
+        if any(added):
+            self._save_json(self.doctors_file, doctors)
+        return added
+    
     def get_doctor(self, doctor_id: str) -> Optional[Doctor]:
         """Get doctor by ID"""
         doctors = self._load_json(self.doctors_file)
@@ -139,6 +355,15 @@ class MedicalDatabase:
         doctors = self._load_json(self.doctors_file)
         return [self._dict_to_doctor(d) for d in doctors]
     
+    def get_doctors_by_ids(self, doctor_ids: Iterable[str]) -> Dict[str, Doctor]:
+        """Get several doctors in one load, keyed by doctor ID"""
+        wanted = set(doctor_ids)
+        return {
+            d['id']: self._dict_to_doctor(d)
+            for d in self._load_json(self.doctors_file)
+            if d['id'] in wanted
+        }
+    
     def _dict_to_doctor(self, data: Dict) -> Doctor:
         """Convert dictionary to Doctor object"""
         return Doctor(
@@ -164,50 +389,213 @@ class MedicalDatabase:
         
         appointments.append(appointment.to_dict())
         self._save_json(self.appointments_file, appointments)
+        self._appts_index_key = None
         return True
     
     def get_appointment(self, appointment_id: str) -> Optional[Appointment]:
         """Get appointment by ID"""
-        appointments = self._load_json(self.appointments_file)
-        for appointment_data in appointments:
-            if appointment_data['id'] == appointment_id:
-                return self._dict_to_appointment(appointment_data)
-        return None
+        records = self._appointment_index()
+        position = self._appts_by_id.get(appointment_id)
+        if position is None:
+            return None
+        return self._dict_to_appointment(records[position])
     
     def get_appointments(self, doctor_id: Optional[str] = None, 
                         patient_id: Optional[str] = None,
                         start_date: Optional[datetime] = None,
                         end_date: Optional[datetime] = None) -> List[Appointment]:
         """Get appointments with optional filters"""
-        appointments = self._load_json(self.appointments_file)
-        result = []
-        
-        for appointment_data in appointments:
-            appointment = self._dict_to_appointment(appointment_data)
-            
-            # Apply filters
-            if doctor_id and appointment.doctor_id != doctor_id:
-                continue
-            if patient_id and appointment.patient_id != patient_id:
-                continue
-            if start_date and appointment.appointment_datetime < start_date:
-                continue
-            if end_date and appointment.appointment_datetime > end_date:
+        return list(self.iter_appointments(doctor_id, patient_id, start_date, end_date))
+    
+    def iter_appointments(self, doctor_id: Optional[str] = None,
+                          patient_id: Optional[str] = None,
+                          start_date: Optional[datetime] = None,
+                          end_date: Optional[datetime] = None) -> Iterator[Appointment]:
+        """Lazily yield appointments matching the optional filters"""
+        records = self._appointment_index()
+        for position in self._appointment_positions(patient_id, start_date, end_date):
+            appointment_data = records[position]
+            # Filter on the raw record before building the Appointment object
+            if doctor_id and appointment_data['doctor_id'] != doctor_id:
                 continue
             
-            result.append(appointment)
+            yield self._dict_to_appointment(appointment_data)
+    
+    def get_patient_appointments_sorted(self, patient_id: str,
+                                        after: Optional[datetime] = None) -> List[Appointment]:
+        """Get a patient's appointments sorted by time, optionally only those strictly after `after`"""
+        records = self._appointment_index()
+        positions = self._appts_by_patient_sorted.get(patient_id, [])
+        if after is not None and positions:
+            positions = positions[bisect_right(self._appt_dts_by_patient[patient_id], after):]
+        return [self._dict_to_appointment(records[position]) for position in positions]
+    
+    def get_doctor_day_appointments(self, doctor_id: str, day: date) -> List[Appointment]:
+        """Get a doctor's appointments on one calendar day, sorted by time"""
+        records = self._appointment_index()
+        return [
+            self._dict_to_appointment(records[position])
+            for position in self._appts_by_doctor_day.get((doctor_id, day), [])
+        ]
+    
+    def _date_window(self, start_date: Optional[datetime],
+                     end_date: Optional[datetime]) -> Tuple[int, int]:
+        """Slice bounds of the datetime-sorted index covering the inclusive date window"""
+        lo = bisect_left(self._appt_dts, start_date) if start_date else 0
+        hi = bisect_right(self._appt_dts, end_date) if end_date else len(self._appt_dts)
+        return lo, hi
+    
+    def _appointment_positions(self, patient_id: Optional[str] = None,
+                               start_date: Optional[datetime] = None,
+                               end_date: Optional[datetime] = None) -> Sequence[int]:
+        """File positions of matching appointments, in file order, narrowed through the indices"""
+        self._appointment_index()
+        datetimes = self._appt_datetimes
+        
+        if patient_id:
+            positions = self._appts_by_patient.get(patient_id, [])
+            if start_date:
+                positions = [p for p in positions if datetimes[p] >= start_date]
+            if end_date:
+                positions = [p for p in positions if datetimes[p] <= end_date]
+            return positions
+        
+        if start_date or end_date:
+            # Binary-search the date window, then restore file order
+            lo, hi = self._date_window(start_date, end_date)
+            return sorted(self._appts_sorted_by_dt[lo:hi])
+        
+        return range(len(datetimes))
+    
+    def count_appointments_by_status(self, start_date: Optional[datetime] = None,
+                                     end_date: Optional[datetime] = None) -> Dict[AppointmentStatus, int]:
+        """Count appointments per status in an optional date window with one bincount"""
+        self._appointment_index()
+        lo, hi = self._date_window(start_date, end_date)
+        counts = np.bincount(self._status_arr[lo:hi], minlength=max(AppointmentStatus) + 1)
+        return {status: int(counts[status]) for status in AppointmentStatus}
+    
+    def get_recent_appointments(self, limit: int = 5) -> List[Appointment]:
+        """Get the latest appointments by time, newest first, from the tail of the sorted index"""
+        records = self._appointment_index()
+        if limit <= 0 or not self._appt_dts:
+            return []
+        
+        # Take every row tied with the limit-th newest so ties keep file order
+        lo = bisect_left(self._appt_dts, self._appt_dts[-min(limit, len(self._appt_dts))])
+        datetimes = self._appt_datetimes
+        positions = sorted(self._appts_sorted_by_dt[lo:], key=datetimes.__getitem__, reverse=True)
+        return [self._dict_to_appointment(records[position]) for position in positions[:limit]]
+    
+    def get_latest_active_appointment(self, patient_id: str) -> Optional[Appointment]:
+        """Get the patient's latest scheduled or confirmed appointment from the sorted index"""
+        records = self._appointment_index()
+        for position in reversed(self._appts_by_patient_sorted.get(patient_id, [])):
+            if records[position]['status'] in _ACTIVE_STATUS_LABELS:
+                return self._dict_to_appointment(records[position])
+        return None
+    
+    def get_next_appointments_bulk(self, patient_ids: List[str],
+                                   after: Optional[datetime] = None) -> Dict[str, Appointment]:
+        """Get each patient's next scheduled or confirmed appointment from the per-patient time index"""
+        if after is None:
+            after = datetime.now()
+        
+        records = self._appointment_index()
+        next_by_patient = {}
+        for patient_id in set(patient_ids):
+            positions = self._appts_by_patient_sorted.get(patient_id)
+            if not positions:
+                continue
+            # Walk forward from the first appointment after `after` to the first active one
+            start = bisect_right(self._appt_dts_by_patient[patient_id], after)
+            for position in positions[start:]:
+                if records[position]['status'] in _ACTIVE_STATUS_LABELS:
+                    next_by_patient[patient_id] = self._dict_to_appointment(records[position])
+                    break
         
-        return result
+        return next_by_patient
+    
+    def get_appointments_dataframe(self, start_date: Optional[datetime] = None,
+                                   end_date: Optional[datetime] = None,
+                                   patient_id: Optional[str] = None) -> Dict[str, np.ndarray]:
+        """Get a column-oriented view of appointments for vectorized aggregation"""
+        records = self._appointment_index()
+        ids = []
+        verified = []
+        statuses = []
+        datetimes = []
+        
+        for position in self._appointment_positions(patient_id, start_date, end_date):
+            appointment_data = records[position]
+            ids.append(appointment_data['id'])
+            verified.append(appointment_data['insurance_verified'])
+            statuses.append(appointment_data['status'])
+            datetimes.append(self._appt_datetimes[position])
+        
+        return {
+            'id': np.array(ids, dtype=object),
+            'insurance_verified': np.array(verified, dtype=np.bool_),
+            'status': np.array(statuses, dtype=str),
+            'appointment_datetime': np.array(datetimes, dtype='datetime64[us]')
+        }
     
     def update_appointment(self, appointment: Appointment) -> bool:
         """Update appointment information"""
-        appointments = self._load_json(self.appointments_file)
-        for i, a in enumerate(appointments):
-            if a['id'] == appointment.id:
-                appointments[i] = appointment.to_dict()
-                self._save_json(self.appointments_file, appointments)
-                return True
-        return False
+        appointments = self._appointment_index()
+        position = self._appts_by_id.get(appointment.id)
+        if position is None:
+            return False
+        
+        patched = self._patch_appointment_record(position, appointment.to_dict())
+        self._save_json(self.appointments_file, appointments)
+        self._appts_index_key = self._file_key(self.appointments_file) if patched else None
+        return True
+    
+    def update_appointments_bulk(self, updated: List[Appointment]) -> int:
+        """Update several appointments with a single file write, returning how many matched"""
+        by_id = {appointment.id: appointment for appointment in updated}
+        if not by_id:
+            return 0
+        
+        appointments = self._appointment_index()
+        matched = 0
+        patched = True
+        for appointment_id, appointment in by_id.items():
+            position = self._appts_by_id.get(appointment_id)
+            if position is not None:
+                patched = self._patch_appointment_record(position, appointment.to_dict()) and patched
+                matched += 1
+        if matched:
+            self._save_json(self.appointments_file, appointments)
+            self._appts_index_key = self._file_key(self.appointments_file) if patched else None
+        return matched
+    
+    def _patch_appointment_record(self, position: int, record: Dict) -> bool:
+        """Replace the indexed record at a position, keeping the status indices current
+        
+        Returns False when the patient, doctor or time changed; those move the record
+        within the sorted indices, so the caller must let them rebuild instead.
+        """
+        old = self._appt_records[position]
+        self._appt_records[position] = record
+        if (record['patient_id'] != old['patient_id'] or record['doctor_id'] != old['doctor_id'] or
+                record['appointment_datetime'] != old['appointment_datetime']):
+            return False
+        
+        old_status = AppointmentStatus.from_label(old['status'])
+        new_status = AppointmentStatus.from_label(record['status'])
+        if new_status != old_status:
+            # Status buckets are in file order
+            bucket = self._appts_by_status[old_status]
+            del bucket[bisect_left(bucket, position)]
+            insort(self._appts_by_status[new_status], position)
+            # Find the position's slot in time order; equal datetimes are adjacent
+            rank = bisect_left(self._appt_dts, self._appt_datetimes[position])
+            while self._appts_sorted_by_dt[rank] != position:
+                rank += 1
+            self._status_arr[rank] = new_status
+        return True
     
     def _dict_to_appointment(self, data: Dict) -> Appointment:
         """Convert dictionary to Appointment object"""
@@ -217,7 +605,7 @@ class MedicalDatabase:
             doctor_id=data['doctor_id'],
             appointment_datetime=datetime.fromisoformat(data['appointment_datetime']),
             duration=data['duration'],
-            status=AppointmentStatus(data['status']),
+            status=AppointmentStatus.from_label(data['status']),
             appointment_type=data['appointment_type'],
             notes=data['notes'],
             insurance_verified=data['insurance_verified'],
@@ -239,6 +627,16 @@ class MedicalDatabase:
         self._save_json(self.predictions_file, predictions)
         return True
     
+    def add_no_show_predictions(self, new_predictions: List[NoShowPrediction]) -> bool:
+        """Add several no-show predictions with a single file write"""
+        replaced = {prediction.appointment_id for prediction in new_predictions}
+        predictions = self._load_json(self.predictions_file)
+        predictions = [p for p in predictions if p['appointment_id'] not in replaced]
+        
+        predictions.extend(prediction.to_dict() for prediction in new_predictions)
+        self._save_json(self.predictions_file, predictions)
+        return True
+    
     def get_no_show_prediction(self, appointment_id: str) -> Optional[NoShowPrediction]:
         """Get no-show prediction for an appointment"""
         predictions = self._load_json(self.predictions_file)
@@ -247,6 +645,15 @@ class MedicalDatabase:
                 return self._dict_to_no_show_prediction(prediction_data)
         return None
     
+    def get_predictions_by_ids(self, appointment_ids: List[str]) -> Dict[str, NoShowPrediction]:
+        """Get no-show predictions for several appointments in one load, keyed by appointment ID"""
+        wanted = set(appointment_ids)
+        return {
+            prediction_data['appointment_id']: self._dict_to_no_show_prediction(prediction_data)
+            for prediction_data in self._load_json(self.predictions_file)
+            if prediction_data['appointment_id'] in wanted
+        }
+    
     def _dict_to_no_show_prediction(self, data: Dict) -> NoShowPrediction:
         """Convert dictionary to NoShowPrediction object"""
         return NoShowPrediction(
@@ -254,7 +661,8 @@ class MedicalDatabase:
             appointment_id=data['appointment_id'],
             risk_score=data['risk_score'],
             risk_factors=data['risk_factors'],
-            prediction_date=datetime.fromisoformat(data['prediction_date'])
+            prediction_date=datetime.fromisoformat(data['prediction_date']),
+            input_hash=data.get('input_hash')
         )
     
     # Clinic Settings
@@ -268,6 +676,7 @@ class MedicalDatabase:
     def update_clinic_settings(self, settings: ClinicSettings) -> bool:
         """Update clinic settings"""
         self._save_json(self.settings_file, [settings.to_dict()])
+        self.settings_version += 1
         return True
     
     def _dict_to_clinic_settings(self, data: Dict) -> ClinicSettings:
@@ -286,35 +695,69 @@ class MedicalDatabase:
             cancellation_policy_hours=data.get('cancellation_policy_hours', 24)
         )
     
-    def get_appointments_needing_reminders(self, hours_before: int = 24) -> List[Appointment]:
-        """Get appointments that need reminders"""
-        cutoff_time = datetime.now() + timedelta(hours=hours_before)
-        appointments = self.get_appointments()
+    def get_appointments_needing_reminders(self, hours_before: int = 24,
+                                          now: Optional[datetime] = None) -> List[Appointment]:
+        """Get appointments that need reminders, as of `now` (default: the current time)"""
+        if now is None:
+            now = datetime.now()
+        cutoff_time = now + timedelta(hours=hours_before)
+        records = self._appointment_index()
         
-        needing_reminders = []
-        for appointment in appointments:
-            if (appointment.status.value in ['scheduled', 'confirmed'] and
-                appointment.appointment_datetime <= cutoff_time and
-                not appointment.reminder_sent):
-                needing_reminders.append(appointment)
+        # Merge the active status buckets back into file order
+        active_positions = sorted(
+            position for status in _ACTIVE_STATUSES for position in self._appts_by_status[status]
+        )
         
-        return needing_reminders
+        # Filter on the raw records so handled rows never become Appointment objects
+        datetimes = self._appt_datetimes
+        return [
+            self._dict_to_appointment(records[position])
+            for position in active_positions
+            if datetimes[position] <= cutoff_time and not records[position]['reminder_sent']
+        ]
     
-    def get_appointments_needing_confirmation(self, hours_before: int = 2) -> List[Appointment]:
-        """Get appointments that need confirmation"""
-        cutoff_time = datetime.now() + timedelta(hours=hours_before)
-        appointments = self.get_appointments()
+    def get_reminder_batch_soa(self, hours_before: int = 24,
+                               now: Optional[datetime] = None) -> Dict[str, Any]:
+        """Column view of active appointments due within hours_before, in file order
+        
+        Returns parallel 'ids', 'patient_ids' and 'doctor_ids' lists plus 'reminder_sent'
+        (bool) and 'ts' (datetime64[s]) arrays, so a reminder sweep can mask rows
+        without building Appointment objects. The window is measured from `now`,
+        defaulting to the current time.
+        """
+        if now is None:
+            now = datetime.now()
+        cutoff_time = now + timedelta(hours=hours_before)
+        records = self._appointment_index()
         
-        needing_confirmation = []
-        for appointment in appointments:
-            if (appointment.status.value == 'scheduled' and
-                appointment.appointment_datetime <= cutoff_time and
-                not appointment.confirmation_sent):
-                needing_confirmation.append(appointment)
+        due = bisect_right(self._appt_dts, cutoff_time)
+        active = np.isin(self._status_arr[:due], [int(status) for status in _ACTIVE_STATUSES])
+        positions = sorted(self._appts_sorted_by_dt[i] for i in np.flatnonzero(active))
         
-        return needing_confirmation
+        return {
+            'ids': [records[p]['id'] for p in positions],
+            'patient_ids': [records[p]['patient_id'] for p in positions],
+            'doctor_ids': [records[p]['doctor_id'] for p in positions],
+            'reminder_sent': np.array([records[p]['reminder_sent'] for p in positions], dtype=bool),
+            'ts': np.array([self._appt_datetimes[p] for p in positions], dtype='datetime64[s]'),
+        }
+    
+    def get_appointments_needing_confirmation(self, hours_before: int = 2,
+                                              now: Optional[datetime] = None) -> List[Appointment]:
+        """Get appointments that need confirmation, as of `now` (default: the current time)"""
+        if now is None:
+            now = datetime.now()
+        cutoff_time = now + timedelta(hours=hours_before)
+        records = self._appointment_index()
+        
+        datetimes = self._appt_datetimes
+        return [
+            self._dict_to_appointment(records[position])
+            for position in self._appts_by_status[AppointmentStatus.SCHEDULED]
+            if datetimes[position] <= cutoff_time and not records[position]['confirmation_sent']
+        ]
     
     def get_high_risk_patients(self) -> List[Patient]:
         """Get patients with high no-show risk"""
-        patients = self.get_patients()
-        return [p for p in patients if p.status.value == 'high_risk']
+        records = self._patient_index()
+        return [self._dict_to_patient(records[position]) for position in self._high_risk_patient_positions]
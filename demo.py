@@ -7,7 +7,7 @@ from datetime import datetime, timedelta
 from database import MedicalDatabase
 from scheduling_service import SchedulingService
 from no_show_predictor import NoShowPredictor
-from notification_service import NotificationService
+from notification_service import NotificationService, configure_logging
 from insurance_service import InsuranceService
 from analytics_service import AnalyticsService
 from models import Doctor, Patient, Appointment, ClinicSettings
@@ -72,8 +72,8 @@ def run_demo():
         )
     ]
     
-    for doctor in doctors:
-        if db.add_doctor(doctor):
+    for doctor, added in zip(doctors, db.add_doctors_bulk(doctors)):
+        if added:
             print(f"✅ Added: Dr. {doctor.first_name} {doctor.last_name} ({doctor.specialty})")
         else:
             print(f"⚠️  Doctor already exists: Dr. {doctor.first_name} {doctor.last_name}")
@@ -546,6 +546,7 @@ def view_analytics_interactive():
 
 
 if __name__ == "__main__":
+    configure_logging()
     if len(sys.argv) > 1 and sys.argv[1] == "interactive":
         interactive_demo()
     else:
@@ -1,42 +1,131 @@
 """
 Insurance Verification and Collection Automation Service for the Medical Appointment Scheduling AI Agent
 """
+import itertools
 import re
+import time
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from types import MappingProxyType
+from typing import Dict, List, Mapping, NamedTuple, Optional, Pattern, Tuple
 from models import Patient, Appointment, InsuranceStatus
 from database import MedicalDatabase
 
 
+class CoverageInfo(NamedTuple):
+    """Immutable insurance coverage record"""
+    active: bool
+    copay: int
+    deductible: int
+    reason: Optional[str] = None
+    note: Optional[str] = None
+    
+    def to_dict(self) -> dict:
+        coverage = {'active': self.active, 'copay': self.copay, 'deductible': self.deductible}
+        if self.reason is not None:
+            coverage['reason'] = self.reason
+        if self.note is not None:
+            coverage['note'] = self.note
+        return coverage
+
+
+# Insurance provider patterns for validation
+_INSURANCE_PATTERNS: Mapping[str, Pattern] = MappingProxyType({
+    provider: re.compile(pattern) for provider, pattern in {
+        'medicare': r'^[0-9]{3}-[0-9]{2}-[0-9]{4}$',
+        'medicaid': r'^[A-Z]{2}[0-9]{8}$',
+        'blue_cross': r'^[A-Z]{3}[0-9]{6}$',
+        'aetna': r'^[0-9]{9}$',
+        'cigna': r'^[0-9]{10}$',
+        'humana': r'^[0-9]{9}$',
+        'kaiser': r'^[0-9]{10}$',
+        'united_healthcare': r'^[0-9]{9}$'
+    }.items()
+})
+
+# Insurance coverage verification (simulated)
+_BASE_COVERAGE: Mapping[str, CoverageInfo] = MappingProxyType({
+    'medicare': CoverageInfo(active=True, copay=20, deductible=0),
+    'medicaid': CoverageInfo(active=True, copay=0, deductible=0),
+    'blue_cross': CoverageInfo(active=True, copay=25, deductible=500),
+    'aetna': CoverageInfo(active=True, copay=30, deductible=1000),
+    'cigna': CoverageInfo(active=True, copay=25, deductible=750),
+    'humana': CoverageInfo(active=True, copay=20, deductible=500),
+    'kaiser': CoverageInfo(active=True, copay=15, deductible=0),
+    'united_healthcare': CoverageInfo(active=True, copay=30, deductible=1000)
+})
+
+_PROVIDER_NOT_FOUND = CoverageInfo(
+    active=False, copay=0, deductible=0, reason='Provider not found in system'
+)
+
+
+# Raw provider name -> normalized lookup key (e.g. "Blue Cross" -> "blue_cross")
+_PROVIDER_NORMALIZER: Dict[str, str] = {}
+
+
+def _normalize_provider(provider: str) -> str:
+    """Normalize a provider name to its lookup key, memoizing the result"""
+    normalized = _PROVIDER_NORMALIZER.get(provider)
+    if normalized is None:
+        normalized = provider.lower().replace(' ', '_')
+        _PROVIDER_NORMALIZER[provider] = normalized
+    return normalized
+
+
+# Spaces and dashes allowed as separators in credit card numbers
+_STRIP_CARD_SEPARATORS = str.maketrans('', '', ' -')
+
+
+# Static payment option templates; get_payment_options only fills in the amount
+_INSURANCE_OPTION = MappingProxyType(
+    {'type': 'insurance', 'description': 'Insurance coverage', 'amount': 0, 'available': True}
+)
+_CASH_OPTION = MappingProxyType(
+    {'type': 'cash', 'description': 'Cash payment', 'amount': None, 'available': True}
+)
+_CREDIT_CARD_OPTION = MappingProxyType(
+    {'type': 'credit_card', 'description': 'Credit card payment', 'amount': None, 'available': True}
+)
+_PAYMENT_PLAN_OPTION = MappingProxyType({
+    'type': 'payment_plan', 'description': 'Payment plan (3 installments)',
+    'amount': None, 'available': True, 'installments': 3
+})
+_FINANCIAL_ASSISTANCE_OPTION = MappingProxyType({
+    'type': 'financial_assistance', 'description': 'Financial assistance program',
+    'amount': None, 'available': True, 'requires_application': True
+})
+
+# Payment IDs share one formatted timestamp per second; the counter keeps IDs
+# unique when several payments land in the same second
+_payment_counter = itertools.count()
+_timestamp_cache: Tuple[int, str] = (0, '')
+
+
+def _timestamp_string() -> str:
+    """Get the current time as YYYYmmddHHMMSS, formatting at most once per second"""
+    global _timestamp_cache
+    second = int(time.time())
+    cached_second, formatted = _timestamp_cache
+    if second != cached_second:
+        formatted = datetime.fromtimestamp(second).strftime("%Y%m%d%H%M%S")
+        _timestamp_cache = (second, formatted)
+    return formatted
+
+
+def _payment_id(prefix: str, appointment_id: str) -> str:
+    """Build a unique payment ID for an appointment"""
+    return f'{prefix}_{appointment_id}_{_timestamp_string()}_{next(_payment_counter)}'
+
+
 class InsuranceService:
     """Insurance verification and collection automation service"""
     
     def __init__(self, database: MedicalDatabase):
         self.db = database
         
-        # Insurance provider patterns for validation
-        self.insurance_patterns = {
-            'medicare': r'^[0-9]{3}-[0-9]{2}-[0-9]{4}$',
-            'medicaid': r'^[A-Z]{2}[0-9]{8}$',
-            'blue_cross': r'^[A-Z]{3}[0-9]{6}$',
-            'aetna': r'^[0-9]{9}$',
-            'cigna': r'^[0-9]{10}$',
-            'humana': r'^[0-9]{9}$',
-            'kaiser': r'^[0-9]{10}$',
-            'united_healthcare': r'^[0-9]{9}$'
-        }
-        
-        # Insurance coverage verification (simulated)
-        self.coverage_database = {
-            'medicare': {'active': True, 'copay': 20, 'deductible': 0},
-            'medicaid': {'active': True, 'copay': 0, 'deductible': 0},
-            'blue_cross': {'active': True, 'copay': 25, 'deductible': 500},
-            'aetna': {'active': True, 'copay': 30, 'deductible': 1000},
-            'cigna': {'active': True, 'copay': 25, 'deductible': 750},
-            'humana': {'active': True, 'copay': 20, 'deductible': 500},
-            'kaiser': {'active': True, 'copay': 15, 'deductible': 0},
-            'united_healthcare': {'active': True, 'copay': 30, 'deductible': 1000}
-        }
+        # Validation patterns and coverage data are immutable and shared by all instances
+        self.insurance_patterns = _INSURANCE_PATTERNS
+        self.coverage_database = _BASE_COVERAGE
     
     def verify_insurance(self, patient_id: str, appointment_id: str) -> Dict:
         """Verify patient's insurance coverage"""
@@ -46,58 +135,90 @@ class InsuranceService:
         if not patient or not appointment:
             return {'status': 'error', 'message': 'Patient or appointment not found'}
         
-        # Validate insurance number format
-        validation_result = self._validate_insurance_number(
-            patient.insurance_provider, patient.insurance_number
-        )
+        return self._verify_loaded(patient, appointment)[0]
+    
+    def _verify_loaded(self, patient: Patient, appointment: Appointment,
+                       coverage_info: Optional[CoverageInfo] = None) -> Tuple[Dict, Optional[CoverageInfo]]:
+        """Verify insurance for an already loaded patient and appointment
+        
+        Returns the public verification result together with the coverage record
+        (None when the insurance number is invalid).
+        """
+        # Validate insurance number format and check coverage in simulated database
+        if coverage_info is None:
+            validation_result, coverage_info = self._validate_and_cover(
+                patient.insurance_provider, patient.insurance_number
+            )
+        else:
+            validation_result = self._validate_insurance_number(
+                patient.insurance_provider, patient.insurance_number
+            )
         
         if not validation_result['valid']:
             return {
                 'status': 'invalid',
                 'message': validation_result['message'],
                 'insurance_status': InsuranceStatus.INVALID
-            }
-        
-        # Check coverage in simulated database
-        coverage_info = self._check_coverage(patient.insurance_provider, patient.insurance_number)
+            }, None
         
-        if not coverage_info['active']:
+        if not coverage_info.active:
             return {
                 'status': 'expired',
                 'message': 'Insurance coverage is not active',
                 'insurance_status': InsuranceStatus.EXPIRED
-            }
+            }, coverage_info
         
-        # Update patient's insurance status
-        patient.insurance_status = InsuranceStatus.VERIFIED
-        self.db.update_patient(patient)
+        # Update patient's insurance status (skip the write if already verified)
+        if patient.insurance_status != InsuranceStatus.VERIFIED:
+            patient.insurance_status = InsuranceStatus.VERIFIED
+            self.db.update_patient(patient)
         
         # Update appointment insurance verification
-        appointment.insurance_verified = True
-        appointment.updated_at = datetime.now()
-        self.db.update_appointment(appointment)
+        if not appointment.insurance_verified:
+            appointment.insurance_verified = True
+            appointment.updated_at = datetime.now()
+            self.db.update_appointment(appointment)
         
         return {
             'status': 'verified',
             'message': 'Insurance verified successfully',
             'insurance_status': InsuranceStatus.VERIFIED,
-            'coverage_info': coverage_info
-        }
+            'coverage_info': coverage_info.to_dict()
+        }, coverage_info
+    
+    def _validate_and_cover(self, provider: str, insurance_number: str) -> Tuple[Dict, Optional[CoverageInfo]]:
+        """Validate the insurance number and check coverage with a single provider lookup
+        
+        Returns (validation_result, coverage_info); coverage_info is None when the
+        number fails validation.
+        """
+        provider_key = _normalize_provider(provider)
+        pattern = self.insurance_patterns.get(provider_key)
+        
+        if pattern is None:
+            return {'valid': False, 'message': f'Unknown insurance provider: {provider}'}, None
+        if not pattern.match(insurance_number):
+            return {'valid': False, 'message': f'Invalid insurance number format for {provider}'}, None
+        
+        return (
+            {'valid': True, 'message': 'Insurance number format is valid'},
+            self._coverage_for_key(provider_key, insurance_number)
+        )
     
     def _validate_insurance_number(self, provider: str, insurance_number: str) -> Dict:
         """Validate insurance number format"""
-        provider_lower = provider.lower().replace(' ', '_')
+        provider_lower = _normalize_provider(provider)
         
         # Check if provider pattern exists
-        if provider_lower not in self.insurance_patterns:
+        pattern = self.insurance_patterns.get(provider_lower)
+        if pattern is None:
             return {
                 'valid': False,
                 'message': f'Unknown insurance provider: {provider}'
             }
         
         # Validate format
-        pattern = self.insurance_patterns[provider_lower]
-        if not re.match(pattern, insurance_number):
+        if not pattern.match(insurance_number):
             return {
                 'valid': False,
                 'message': f'Invalid insurance number format for {provider}'
@@ -105,30 +226,21 @@ class InsuranceService:
         
         return {'valid': True, 'message': 'Insurance number format is valid'}
     
-    def _check_coverage(self, provider: str, insurance_number: str) -> Dict:
-        """Check insurance coverage (simulated)"""
-        provider_lower = provider.lower().replace(' ', '_')
-        
+    def _coverage_for_key(self, provider_lower: str, insurance_number: str) -> CoverageInfo:
+        """Check coverage for an already normalized provider key (simulated)"""
         # Simulate coverage check
-        if provider_lower in self.coverage_database:
-            coverage = self.coverage_database[provider_lower].copy()
-            
-            # Simulate some coverage issues based on insurance number
-            if insurance_number.endswith('0'):
-                coverage['active'] = False
-                coverage['reason'] = 'Policy suspended'
-            elif insurance_number.endswith('1'):
-                coverage['copay'] *= 2  # Higher copay
-                coverage['note'] = 'High-deductible plan'
-            
-            return coverage
-        else:
-            return {
-                'active': False,
-                'copay': 0,
-                'deductible': 0,
-                'reason': 'Provider not found in system'
-            }
+        coverage = self.coverage_database.get(provider_lower)
+        if coverage is None:
+            return _PROVIDER_NOT_FOUND
+        
+        # Simulate some coverage issues based on insurance number; the shared base
+        # record is only copied when an adjustment applies
+        last_char = insurance_number[-1:]
+        if last_char == '0':
+            return coverage._replace(active=False, reason='Policy suspended')
+        if last_char == '1':
+            return coverage._replace(copay=coverage.copay * 2, note='High-deductible plan')
+        return coverage
     
     def calculate_patient_responsibility(self, patient_id: str, appointment_id: str, 
                                        service_cost: float = 150.0) -> Dict:
@@ -139,8 +251,13 @@ class InsuranceService:
         if not patient or not appointment:
             return {'error': 'Patient or appointment not found'}
         
+        return self._responsibility_for(patient, appointment, service_cost)
+    
+    def _responsibility_for(self, patient: Patient, appointment: Appointment,
+                            service_cost: float = 150.0) -> Dict:
+        """Calculate financial responsibility for an already loaded patient and appointment"""
         # Verify insurance first
-        insurance_verification = self.verify_insurance(patient_id, appointment_id)
+        insurance_verification, coverage_info = self._verify_loaded(patient, appointment)
         
         if insurance_verification['status'] != 'verified':
             return {
@@ -152,23 +269,18 @@ class InsuranceService:
                 'message': 'Insurance not verified - full payment required'
             }
         
-        coverage_info = insurance_verification['coverage_info']
-        
         # Calculate patient responsibility
-        copay = coverage_info.get('copay', 0)
-        deductible = coverage_info.get('deductible', 0)
+        copay, deductible = coverage_info.copay, coverage_info.deductible
         
         # Simulate deductible tracking (in real system, this would be persistent)
         remaining_deductible = max(0, deductible - 200)  # Assume some deductible already met
         
-        if remaining_deductible > 0:
-            # Patient pays deductible amount or service cost, whichever is less
-            deductible_payment = min(remaining_deductible, service_cost)
-            copay_payment = 0
-        else:
-            # Deductible met, patient pays copay
-            deductible_payment = 0
-            copay_payment = min(copay, service_cost)
+        # Patient pays the remaining deductible (capped at the service cost); once the
+        # deductible is met they pay the copay instead. Both terms are computed without
+        # branching: the deductible term is zero when nothing remains, and the copay
+        # term is masked by the boolean.
+        deductible_payment = min(remaining_deductible, service_cost)
+        copay_payment = (remaining_deductible == 0) * min(copay, service_cost)
         
         patient_responsibility = deductible_payment + copay_payment
         insurance_coverage = service_cost - patient_responsibility
@@ -196,48 +308,19 @@ class InsuranceService:
         
         # Insurance coverage
         if patient.insurance_status == InsuranceStatus.VERIFIED:
-            payment_options.append({
-                'type': 'insurance',
-                'description': 'Insurance coverage',
-                'amount': 0,
-                'available': True
-            })
-        
-        # Cash payment
-        payment_options.append({
-            'type': 'cash',
-            'description': 'Cash payment',
-            'amount': amount,
-            'available': True
-        })
+            payment_options.append(dict(_INSURANCE_OPTION))
         
-        # Credit card
-        payment_options.append({
-            'type': 'credit_card',
-            'description': 'Credit card payment',
-            'amount': amount,
-            'available': True
-        })
+        # Cash payment and credit card
+        payment_options.append({**_CASH_OPTION, 'amount': amount})
+        payment_options.append({**_CREDIT_CARD_OPTION, 'amount': amount})
         
         # Payment plan (for amounts over $100)
         if amount > 100:
-            payment_options.append({
-                'type': 'payment_plan',
-                'description': 'Payment plan (3 installments)',
-                'amount': amount / 3,
-                'available': True,
-                'installments': 3
-            })
-        
-        # Financial assistance (for high amounts)
-        if amount > 500:
-            payment_options.append({
-                'type': 'financial_assistance',
-                'description': 'Financial assistance program',
-                'amount': amount * 0.5,  # 50% reduction
-                'available': True,
-                'requires_application': True
-            })
+            payment_options.append({**_PAYMENT_PLAN_OPTION, 'amount': amount / 3})
+            
+            # Financial assistance (for high amounts)
+            if amount > 500:
+                payment_options.append({**_FINANCIAL_ASSISTANCE_OPTION, 'amount': amount * 0.5})  # 50% reduction
         
         return payment_options
     
@@ -245,6 +328,14 @@ class InsuranceService:
                        payment_type: str, amount: float, 
                        payment_details: Dict = None) -> Dict:
         """Process payment for appointment"""
+        return self.collect(patient_id, appointment_id, payment_type, amount, payment_details)
+    
+    def collect(self, patient_id: str, appointment_id: str, payment_type: str,
+                amount: float, payment_details: Dict = None) -> Dict:
+        """Verify insurance, calculate responsibility and process payment in a single pass
+        
+        The patient and appointment are loaded once and shared by every step.
+        """
         patient = self.db.get_patient(patient_id)
         appointment = self.db.get_appointment(appointment_id)
         
@@ -252,7 +343,7 @@ class InsuranceService:
             return {'status': 'error', 'message': 'Patient or appointment not found'}
         
         # Validate payment amount
-        financial_info = self.calculate_patient_responsibility(patient_id, appointment_id)
+        financial_info = self._responsibility_for(patient, appointment)
         required_amount = financial_info.get('patient_responsibility', 0)
         
         if amount < required_amount:
@@ -281,7 +372,7 @@ class InsuranceService:
         return {
             'status': 'success',
             'message': 'Cash payment processed successfully',
-            'payment_id': f'CASH_{appointment.id}_{datetime.now().strftime("%Y%m%d%H%M%S")}',
+            'payment_id': _payment_id('CASH', appointment.id),
             'amount': amount,
             'payment_type': 'cash'
         }
@@ -294,7 +385,8 @@ class InsuranceService:
         
         # Simulate credit card processing
         card_number = payment_details['card_number']
-        if not re.match(r'^[0-9]{16}$', card_number.replace(' ', '')):
+        cleaned = card_number.translate(_STRIP_CARD_SEPARATORS)
+        if len(cleaned) != 16 or not (cleaned.isascii() and cleaned.isdigit()):
             return {'status': 'error', 'message': 'Invalid credit card number'}
         
         print(f"Credit card payment of ${amount:.2f} processed for {patient.first_name} {patient.last_name}")
@@ -302,7 +394,7 @@ class InsuranceService:
         return {
             'status': 'success',
             'message': 'Credit card payment processed successfully',
-            'payment_id': f'CC_{appointment.id}_{datetime.now().strftime("%Y%m%d%H%M%S")}',
+            'payment_id': _payment_id('CC', appointment.id),
             'amount': amount,
             'payment_type': 'credit_card',
             'last_four': card_number[-4:]
@@ -319,7 +411,7 @@ class InsuranceService:
         return {
             'status': 'success',
             'message': 'Insurance claim submitted successfully',
-            'payment_id': f'INS_{appointment.id}_{datetime.now().strftime("%Y%m%d%H%M%S")}',
+            'payment_id': _payment_id('INS', appointment.id),
             'amount': 0,
             'payment_type': 'insurance'
         }
@@ -338,7 +430,7 @@ class InsuranceService:
         return {
             'status': 'success',
             'message': f'Payment plan set up: {installments} installments of ${installment_amount:.2f}',
-            'payment_id': f'PLAN_{appointment.id}_{datetime.now().strftime("%Y%m%d%H%M%S")}',
+            'payment_id': _payment_id('PLAN', appointment.id),
             'amount': installment_amount,
             'payment_type': 'payment_plan',
             'installments': installments
@@ -346,10 +438,12 @@ class InsuranceService:
     
     def get_insurance_statistics(self, start_date: datetime, end_date: datetime) -> Dict:
         """Get insurance-related statistics"""
-        appointments = self.db.get_appointments(start_date=start_date, end_date=end_date)
-        
-        total_appointments = len(appointments)
-        verified_insurance = sum(1 for a in appointments if a.insurance_verified)
+        # Single streaming pass with two counters; the appointment list is never materialized
+        total_appointments = 0
+        verified_insurance = 0
+        for appointment in self.db.iter_appointments(start_date=start_date, end_date=end_date):
+            total_appointments += 1
+            verified_insurance += appointment.insurance_verified
         unverified_insurance = total_appointments - verified_insurance
         
         # Calculate potential revenue impact
@@ -379,27 +473,33 @@ class InsuranceService:
             'errors': []
         }
         
+        # Bulk-fetch patients and check coverage for the whole batch up front
+        patients_by_id = self.db.get_patients_by_ids(patient_ids)
+        batch_patients = [patients_by_id[pid] for pid in patient_ids if pid in patients_by_id]
+        coverage_by_id = {
+            p.id: self._coverage_for_key(_normalize_provider(p.insurance_provider), p.insurance_number)
+            for p in batch_patients
+        }
+        next_appointments = self.db.get_next_appointments_bulk([p.id for p in batch_patients])
+        
         for patient_id in patient_ids:
             try:
-                patient = self.db.get_patient(patient_id)
+                patient = patients_by_id.get(patient_id)
                 if not patient:
                     results['errors'].append(f'Patient {patient_id} not found')
                     results['failed'] += 1
                     continue
                 
                 # Get next appointment for verification
-                appointments = self.db.get_appointments(patient_id=patient_id)
-                upcoming_appointments = [a for a in appointments 
-                                       if a.appointment_datetime > datetime.now() 
-                                       and a.status.value in ['scheduled', 'confirmed']]
-                
-                if not upcoming_appointments:
+                next_appointment = next_appointments.get(patient_id)
+                if not next_appointment:
                     results['errors'].append(f'No upcoming appointments for patient {patient_id}')
                     results['failed'] += 1
                     continue
                 
-                next_appointment = min(upcoming_appointments, key=lambda x: x.appointment_datetime)
-                verification_result = self.verify_insurance(patient_id, next_appointment.id)
+                verification_result, _ = self._verify_loaded(
+                    patient, next_appointment, coverage_by_id[patient_id]
+                )
                 
                 if verification_result['status'] == 'verified':
                     results['verified'] += 1
@@ -4,33 +4,63 @@ Database models for the Medical Appointment Scheduling AI Agent
 from datetime import datetime, timedelta
 from typing import Optional, List
 from dataclasses import dataclass, field
-from enum import Enum
+from enum import IntEnum
 import json
 
 
-class AppointmentStatus(Enum):
-    SCHEDULED = "scheduled"
-    CONFIRMED = "confirmed"
-    COMPLETED = "completed"
-    CANCELLED = "cancelled"
-    NO_SHOW = "no_show"
-    RESCHEDULED = "rescheduled"
+# Appointment, patient and insurance statuses are IntEnums so that comparisons
+# and hashed membership checks run at C speed; the lowercase member name is the
+# string form persisted in the JSON store.
+class AppointmentStatus(IntEnum):
+    SCHEDULED = 1
+    CONFIRMED = 2
+    COMPLETED = 3
+    CANCELLED = 4
+    NO_SHOW = 5
+    RESCHEDULED = 6
+    
+    @property
+    def label(self) -> str:
+        """Wire-format name of the status (e.g. "no_show")"""
+        return self.name.lower()
+    
+    @classmethod
+    def from_label(cls, label: str) -> "AppointmentStatus":
+        return cls[label.upper()]
 
 
-class PatientStatus(Enum):
-    ACTIVE = "active"
-    INACTIVE = "inactive"
-    HIGH_RISK = "high_risk"
+class PatientStatus(IntEnum):
+    ACTIVE = 1
+    INACTIVE = 2
+    HIGH_RISK = 3
+    
+    @property
+    def label(self) -> str:
+        """Wire-format name of the status (e.g. "high_risk")"""
+        return self.name.lower()
+    
+    @classmethod
+    def from_label(cls, label: str) -> "PatientStatus":
+        return cls[label.upper()]
 
 
-class InsuranceStatus(Enum):
-    VERIFIED = "verified"
-    PENDING = "pending"
-    EXPIRED = "expired"
-    INVALID = "invalid"
+class InsuranceStatus(IntEnum):
+    VERIFIED = 1
+    PENDING = 2
+    EXPIRED = 3
+    INVALID = 4
+    
+    @property
+    def label(self) -> str:
+        """Wire-format name of the status (e.g. "verified")"""
+        return self.name.lower()
+    
+    @classmethod
+    def from_label(cls, label: str) -> "InsuranceStatus":
+        return cls[label.upper()]
 
 
-@dataclass
+@dataclass(slots=True)
 class Patient:
     """Patient information model"""
     id: str
@@ -50,6 +80,16 @@ class Patient:
     preferred_communication: str = "phone"  # phone, email, sms
     notes: str = ""
     created_at: datetime = field(default_factory=datetime.now)
+    _provider_casefold: Optional[tuple] = field(default=None, init=False, repr=False, compare=False)
+    
+    @property
+    def insurance_provider_casefold(self) -> str:
+        """Case-folded insurance provider, recomputed only when the provider changes"""
+        cached = self._provider_casefold
+        if cached is None or cached[0] is not self.insurance_provider:
+            cached = (self.insurance_provider, self.insurance_provider.casefold())
+            self._provider_casefold = cached
+        return cached[1]
     
     def to_dict(self) -> dict:
         return {
@@ -63,8 +103,8 @@ class Patient:
             'emergency_contact': self.emergency_contact,
             'insurance_provider': self.insurance_provider,
             'insurance_number': self.insurance_number,
-            'insurance_status': self.insurance_status.value,
-            'status': self.status.value,
+            'insurance_status': self.insurance_status.label,
+            'status': self.status.label,
             'no_show_count': self.no_show_count,
             'last_appointment': self.last_appointment.isoformat() if self.last_appointment else None,
             'preferred_communication': self.preferred_communication,
@@ -73,7 +113,7 @@ class Patient:
         }
 
 
-@dataclass
+@dataclass(slots=True)
 class Doctor:
     """Doctor/Provider information model"""
     id: str
@@ -86,6 +126,23 @@ class Doctor:
     appointment_duration: int = 30  # minutes
     max_patients_per_day: int = 20
     is_active: bool = True
+    _working_minutes: Optional[tuple] = field(default=None, init=False, repr=False, compare=False)
+    
+    @property
+    def working_hours_minutes(self) -> dict:
+        """Working hours as {day: (start_minute, end_minute)} minutes past midnight,
+        parsed once per working_hours object"""
+        cached = self._working_minutes
+        if cached is None or cached[0] is not self.working_hours:
+            minutes = {}
+            for day, hours in self.working_hours.items():
+                start_hour, start_minute = hours['start'].split(':')
+                end_hour, end_minute = hours['end'].split(':')
+                minutes[day] = (int(start_hour) * 60 + int(start_minute),
+                                int(end_hour) * 60 + int(end_minute))
+            cached = (self.working_hours, minutes)
+            self._working_minutes = cached
+        return cached[1]
     
     def to_dict(self) -> dict:
         return {
@@ -102,7 +159,7 @@ class Doctor:
         }
 
 
-@dataclass
+@dataclass(slots=True)
 class Appointment:
     """Appointment model"""
     id: str
@@ -118,6 +175,16 @@ class Appointment:
     confirmation_sent: bool = False
     created_at: datetime = field(default_factory=datetime.now)
     updated_at: datetime = field(default_factory=datetime.now)
+    _formatted_time: Optional[tuple] = field(default=None, init=False, repr=False, compare=False)
+    
+    @property
+    def formatted_time(self) -> str:
+        """Human-readable appointment time for messages, recomputed only when the datetime changes"""
+        cached = self._formatted_time
+        if cached is None or cached[0] is not self.appointment_datetime:
+            cached = (self.appointment_datetime, self.appointment_datetime.strftime("%B %d, %Y at %I:%M %p"))
+            self._formatted_time = cached
+        return cached[1]
     
     def to_dict(self) -> dict:
         return {
@@ -126,7 +193,7 @@ class Appointment:
             'doctor_id': self.doctor_id,
             'appointment_datetime': self.appointment_datetime.isoformat(),
             'duration': self.duration,
-            'status': self.status.value,
+            'status': self.status.label,
             'appointment_type': self.appointment_type,
             'notes': self.notes,
             'insurance_verified': self.insurance_verified,
@@ -137,6 +204,16 @@ class Appointment:
         }
 
 
+# No-show risk factor descriptions; factor i is bit (1 << i) of
+# NoShowPrediction.risk_factor_mask
+RISK_FACTOR_NAMES = (
+    "High historical no-show rate",
+    "Unfavorable appointment timing",
+    "Demographic risk factors",
+    "Insurance/financial concerns",
+)
+
+
 @dataclass
 class NoShowPrediction:
     """No-show prediction model"""
@@ -145,6 +222,17 @@ class NoShowPrediction:
     risk_score: float  # 0.0 to 1.0
     risk_factors: List[str]
     prediction_date: datetime = field(default_factory=datetime.now)
+    # Digest of the inputs the prediction was scored from; a stored prediction
+    # with a matching digest is still valid
+    input_hash: Optional[str] = None
+    # Bitmask mirror of risk_factors (see RISK_FACTOR_NAMES); derived when not given
+    risk_factor_mask: Optional[int] = field(default=None, compare=False)
+    
+    def __post_init__(self):
+        if self.risk_factor_mask is None:
+            self.risk_factor_mask = sum(
+                1 << bit for bit, name in enumerate(RISK_FACTOR_NAMES) if name in self.risk_factors
+            )
     
     def to_dict(self) -> dict:
         return {
@@ -152,7 +240,8 @@ class NoShowPrediction:
             'appointment_id': self.appointment_id,
             'risk_score': self.risk_score,
             'risk_factors': self.risk_factors,
-            'prediction_date': self.prediction_date.isoformat()
+            'prediction_date': self.prediction_date.isoformat(),
+            'input_hash': self.input_hash
         }
 
 
@@ -1,22 +1,67 @@
 """
 No-Show Prediction System for the Medical Appointment Scheduling AI Agent
 """
+import hashlib
 import math
-from datetime import datetime, timedelta
+import numpy as np
+from datetime import date, datetime, timedelta
 from typing import List, Dict, Tuple, Optional
 try:
-    from .models import Patient, Appointment, NoShowPrediction, AppointmentStatus
+    from .models import (
+        Patient, Appointment, NoShowPrediction, AppointmentStatus, PatientStatus, RISK_FACTOR_NAMES
+    )
     from .database import MedicalDatabase
 except ImportError:
-    from models import Patient, Appointment, NoShowPrediction, AppointmentStatus
+    from models import (
+        Patient, Appointment, NoShowPrediction, AppointmentStatus, PatientStatus, RISK_FACTOR_NAMES
+    )
     from database import MedicalDatabase
 
 
+# Feature order for batch scoring: historical, timing, demographic, financial
+_RISK_WEIGHTS = np.array([0.4, 0.25, 0.2, 0.15])
+_RISK_FACTOR_BITS = 1 << np.arange(len(RISK_FACTOR_NAMES))
+# Risk factor names for every possible factor bitmask, so rows map bits to names by lookup
+_RISK_FACTORS_BY_MASK = tuple(
+    tuple(name for bit, name in enumerate(RISK_FACTOR_NAMES) if mask & (1 << bit))
+    for mask in range(1 << len(RISK_FACTOR_NAMES))
+)
+_HISTORICAL_RISK_BIT, _TIMING_RISK_BIT, _DEMOGRAPHIC_RISK_BIT, _FINANCIAL_RISK_BIT = (
+    1 << bit for bit in range(len(RISK_FACTOR_NAMES))
+)
+_RISK_FACTOR_THRESHOLD = 0.3
+# Highest score the timing, demographic and financial terms can add together
+_MAX_NON_HISTORICAL_SCORE = float(_RISK_WEIGHTS[1:].sum())
+
+_UNRELIABLE_PROVIDERS = frozenset({"medicaid", "medicare", "self_pay"})
+
+# Statuses that hold a slot
+_ACTIVE_STATUSES = frozenset({AppointmentStatus.SCHEDULED, AppointmentStatus.CONFIRMED})
+
+
+# Timing risk lookup tables. Monday, Friday and weekends carry extra risk;
+# early morning, late afternoon and lunch time slots too.
+_WEEKDAY_RISK = np.array([0.1, 0.0, 0.0, 0.0, 0.15, 0.2, 0.2])
+_HOUR_RISK = np.zeros(24)
+_HOUR_RISK[:9] = 0.1
+_HOUR_RISK[17:] = 0.1
+_HOUR_RISK[12] = 0.05
+# Days booked in advance: last-minute (< 1 day) and far ahead (> 30 days)
+_ADVANCE_BOUNDS = np.array([1, 31])
+_ADVANCE_RISK = np.array([0.15, 0.0, 0.1])
+
+
 class NoShowPredictor:
     """AI-powered no-show prediction system"""
     
     def __init__(self, database: MedicalDatabase):
         self.db = database
+        
+        # Historical risk only changes when the appointments file is written (by any
+        # process) or the 90-day window moves to a new day, so it is memoized per
+        # patient until the (appointments file stamp, date) pair changes
+        self._historical_risk_cache: Dict[str, float] = {}
+        self._historical_risk_stamp: Optional[Tuple[Optional[Tuple[int, int]], date]] = None
     
     def predict_no_show_risk(self, patient_id: str, appointment_id: str) -> NoShowPrediction:
         """Predict the risk of a patient not showing up for an appointment"""
@@ -26,42 +71,99 @@ class NoShowPredictor:
         if not patient or not appointment:
             raise ValueError("Patient or appointment not found")
         
+        # One clock snapshot for the input hash and the scoring
+        now = datetime.now()
+        
+        # Reuse the stored prediction if none of its inputs changed
+        input_hash = self._prediction_input_hash(patient, appointment, now=now)
+        existing = self.db.get_no_show_prediction(appointment_id)
+        if existing and existing.input_hash == input_hash:
+            return existing
+        
+        return self._predict_loaded(patient, appointment, now=now, input_hash=input_hash)
+    
+    def _prediction_input_hash(self, patient: Patient, appointment: Appointment,
+                               historical_risk: Optional[float] = None,
+                               now: Optional[datetime] = None) -> str:
+        """Digest of everything a prediction is scored from
+        
+        Batch callers pass the historical risk they already computed and their
+        single clock snapshot.
+        """
+        if now is None:
+            now = datetime.now()
+        if historical_risk is None:
+            historical_risk = self._cached_historical_risk(patient.id, now)
+        inputs = (
+            patient.id,
+            patient.date_of_birth.isoformat(),
+            patient.preferred_communication,
+            patient.status.label,
+            patient.emergency_contact,
+            patient.insurance_provider,
+            patient.insurance_number,
+            appointment.id,
+            appointment.appointment_datetime.isoformat(),
+            appointment.created_at.isoformat(),
+            appointment.insurance_verified,
+            # Appointment history via the memoized historical risk; the date
+            # covers age and the recent-history window
+            historical_risk,
+            now.date().isoformat(),
+        )
+        return hashlib.blake2b(repr(inputs).encode(), digest_size=8).hexdigest()
+    
+    def _predict_loaded(self, patient: Patient, appointment: Appointment,
+                        now: Optional[datetime] = None,
+                        input_hash: Optional[str] = None) -> NoShowPrediction:
+        """Score and save a prediction for an already loaded patient and appointment"""
+        if now is None:
+            now = datetime.now()
+        
         # Calculate risk factors and their weights
         risk_factors = []
+        risk_factor_mask = 0
         risk_score = 0.0
         
         # Historical no-show rate (40% weight)
-        historical_risk = self._calculate_historical_risk(patient)
+        historical_risk = self._cached_historical_risk(patient.id, now)
         risk_score += historical_risk * 0.4
         if historical_risk > 0.3:
             risk_factors.append("High historical no-show rate")
+            risk_factor_mask |= _HISTORICAL_RISK_BIT
         
         # Appointment timing factors (25% weight)
         timing_risk = self._calculate_timing_risk(appointment)
         risk_score += timing_risk * 0.25
         if timing_risk > 0.3:
             risk_factors.append("Unfavorable appointment timing")
+            risk_factor_mask |= _TIMING_RISK_BIT
         
         # Patient demographics and behavior (20% weight)
-        demographic_risk = self._calculate_demographic_risk(patient)
+        demographic_risk = self._calculate_demographic_risk(patient, now)
         risk_score += demographic_risk * 0.2
         if demographic_risk > 0.3:
             risk_factors.append("Demographic risk factors")
+            risk_factor_mask |= _DEMOGRAPHIC_RISK_BIT
         
         # Insurance and financial factors (15% weight)
         financial_risk = self._calculate_financial_risk(patient, appointment)
         risk_score += financial_risk * 0.15
         if financial_risk > 0.3:
             risk_factors.append("Insurance/financial concerns")
+            risk_factor_mask |= _FINANCIAL_RISK_BIT
         
         # Ensure risk score is between 0 and 1
         risk_score = max(0.0, min(1.0, risk_score))
         
         prediction = NoShowPrediction(
-            patient_id=patient_id,
-            appointment_id=appointment_id,
+            patient_id=patient.id,
+            appointment_id=appointment.id,
             risk_score=risk_score,
-            risk_factors=risk_factors
+            risk_factors=risk_factors,
+            input_hash=(input_hash or
+                        self._prediction_input_hash(patient, appointment, historical_risk, now)),
+            risk_factor_mask=risk_factor_mask
         )
         
         # Save prediction to database
@@ -69,26 +171,96 @@ class NoShowPredictor:
         
         return prediction
     
-    def _calculate_historical_risk(self, patient: Patient) -> float:
-        """Calculate risk based on patient's historical no-show behavior"""
-        # Get patient's appointment history
-        appointments = self.db.get_appointments(patient_id=patient.id)
+    def predict_no_show_risk_batch(self, pairs: List[Tuple[str, str]]) -> List[NoShowPrediction]:
+        """Predict no-show risk for many (patient_id, appointment_id) pairs at once"""
+        patients = {p.id: p for p in self.db.get_patients()}
+        loaded = []
+        for patient_id, appointment_id in pairs:
+            patient = patients.get(patient_id)
+            appointment = self.db.get_appointment(appointment_id)
+            if not patient or not appointment:
+                raise ValueError("Patient or appointment not found")
+            loaded.append((patient, appointment))
+        
+        return self._predict_loaded_batch(loaded)
+    
+    def _predict_loaded_batch(self, loaded: List[Tuple[Patient, Appointment]],
+                              now: Optional[datetime] = None) -> List[NoShowPrediction]:
+        """Score already loaded pairs as one feature matrix and save them in one write"""
+        if not loaded:
+            return []
+        
+        # One clock read for the whole batch
+        if now is None:
+            now = datetime.now()
+        patients = [patient for patient, _ in loaded]
+        historical = [self._cached_historical_risk(patient.id, now) for patient in patients]
+        features = np.array([
+            (
+                historical_risk,
+                0.0,
+                0.0,
+                self._calculate_financial_risk(patient, appointment),
+            )
+            for (patient, appointment), historical_risk in zip(loaded, historical)
+        ])
+        features[:, 1] = self._calculate_timing_risk_batch([appointment for _, appointment in loaded])
+        features[:, 2] = self._calculate_demographic_risk_batch(patients, now)
+        scores = np.clip(features @ _RISK_WEIGHTS, 0.0, 1.0)
+        factor_bits = ((features > _RISK_FACTOR_THRESHOLD) @ _RISK_FACTOR_BITS).tolist()
+        
+        predictions = [
+            NoShowPrediction(
+                patient_id=patient.id,
+                appointment_id=appointment.id,
+                risk_score=float(score),
+                risk_factors=list(_RISK_FACTORS_BY_MASK[bits]),
+                input_hash=self._prediction_input_hash(patient, appointment, historical_risk, now),
+                risk_factor_mask=bits
+            )
+            for (patient, appointment), score, bits, historical_risk
+            in zip(loaded, scores, factor_bits, historical)
+        ]
+        
+        self.db.add_no_show_predictions(predictions)
+        return predictions
+    
+    def _cached_historical_risk(self, patient_id: str, now: Optional[datetime] = None) -> float:
+        """Historical risk for a patient, memoized for the current appointments file and day"""
+        if now is None:
+            now = datetime.now()
+        stamp = (self.db.appointments_stamp(), now.date())
+        if stamp != self._historical_risk_stamp:
+            self._historical_risk_cache.clear()
+            self._historical_risk_stamp = stamp
+        risk = self._historical_risk_cache.get(patient_id)
+        if risk is None:
+            risk = self._historical_risk(patient_id, now)
+            self._historical_risk_cache[patient_id] = risk
+        return risk
+    
+    def _historical_risk(self, patient_id: str, now: datetime) -> float:
+        """Uncached historical risk, with the recent-history window ending at now"""
+        # Get patient's appointment history as status/datetime columns
+        columns = self.db.get_appointments_dataframe(patient_id=patient_id)
+        statuses = columns['status']
         
-        if len(appointments) < 2:
+        if statuses.size < 2:
             # New patients have moderate risk
             return 0.3
         
-        no_shows = sum(1 for a in appointments if a.status == AppointmentStatus.NO_SHOW)
-        total_appointments = len(appointments)
+        no_show_mask = statuses == AppointmentStatus.NO_SHOW.label
+        no_shows = int(no_show_mask.sum())
+        total_appointments = statuses.size
         no_show_rate = no_shows / total_appointments
         
         # Recent behavior has more weight
-        recent_appointments = [a for a in appointments 
-                             if a.appointment_datetime > datetime.now() - timedelta(days=90)]
-        if recent_appointments:
-            recent_no_shows = sum(1 for a in recent_appointments 
-                                if a.status == AppointmentStatus.NO_SHOW)
-            recent_no_show_rate = recent_no_shows / len(recent_appointments)
+        cutoff = np.datetime64(now - timedelta(days=90))
+        recent_mask = columns['appointment_datetime'] > cutoff
+        recent_count = int(recent_mask.sum())
+        if recent_count:
+            recent_no_shows = int((no_show_mask & recent_mask).sum())
+            recent_no_show_rate = recent_no_shows / recent_count
             # Weight recent behavior more heavily
             no_show_rate = (no_show_rate * 0.3) + (recent_no_show_rate * 0.7)
         
@@ -96,44 +268,33 @@ class NoShowPredictor:
     
     def _calculate_timing_risk(self, appointment: Appointment) -> float:
         """Calculate risk based on appointment timing factors"""
-        risk = 0.0
         appointment_time = appointment.appointment_datetime
-        
-        # Day of week risk
-        weekday = appointment_time.weekday()
-        if weekday == 0:  # Monday
-            risk += 0.1
-        elif weekday == 4:  # Friday
-            risk += 0.15
-        elif weekday >= 5:  # Weekend
-            risk += 0.2
-        
-        # Time of day risk
-        hour = appointment_time.hour
-        if hour < 9 or hour > 16:  # Early morning or late afternoon
-            risk += 0.1
-        elif hour == 12:  # Lunch time
-            risk += 0.05
-        
-        # Advance booking risk (appointments booked too far in advance)
         days_advance = (appointment_time - appointment.created_at).days
-        if days_advance > 30:
-            risk += 0.1
-        elif days_advance > 60:
-            risk += 0.2
         
-        # Last-minute booking risk
-        if days_advance < 1:
-            risk += 0.15
-        
-        return min(1.0, risk)
+        risk = (_WEEKDAY_RISK[appointment_time.weekday()]
+                + _HOUR_RISK[appointment_time.hour]
+                + _ADVANCE_RISK[np.searchsorted(_ADVANCE_BOUNDS, days_advance, side='right')])
+        return min(1.0, float(risk))
+    
+    def _calculate_timing_risk_batch(self, appointments: List[Appointment]) -> np.ndarray:
+        """Vectorized timing risk for many appointments using the same lookup tables"""
+        weekdays = np.array([a.appointment_datetime.weekday() for a in appointments])
+        hours = np.array([a.appointment_datetime.hour for a in appointments])
+        days_advance = np.array([(a.appointment_datetime - a.created_at).days for a in appointments])
+        
+        risk = (_WEEKDAY_RISK[weekdays]
+                + _HOUR_RISK[hours]
+                + _ADVANCE_RISK[np.searchsorted(_ADVANCE_BOUNDS, days_advance, side='right')])
+        return np.minimum(1.0, risk)
     
-    def _calculate_demographic_risk(self, patient: Patient) -> float:
+    def _calculate_demographic_risk(self, patient: Patient, now: Optional[datetime] = None) -> float:
         """Calculate risk based on patient demographics and behavior"""
         risk = 0.0
         
         # Age-based risk (younger patients tend to no-show more)
-        age = (datetime.now() - patient.date_of_birth).days / 365.25
+        if now is None:
+            now = datetime.now()
+        age = (now - patient.date_of_birth).days / 365.25
         if age < 25:
             risk += 0.2
         elif age < 35:
@@ -146,7 +307,7 @@ class NoShowPredictor:
             risk += 0.05  # Email reminders are less effective
         
         # Patient status
-        if patient.status.value == "high_risk":
+        if patient.status == PatientStatus.HIGH_RISK:
             risk += 0.3
         
         # Emergency contact availability (proxy for reliability)
@@ -155,6 +316,17 @@ class NoShowPredictor:
         
         return max(0.0, min(1.0, risk))
     
+    def _calculate_demographic_risk_batch(self, patients: List[Patient], now: datetime) -> np.ndarray:
+        """Vectorized demographic risk, adding terms in the same order as the scalar path"""
+        ages = np.array([(now - patient.date_of_birth).days for patient in patients]) / 365.25
+        risk = np.select([ages < 25, ages < 35, ages > 65], [0.2, 0.1, -0.1], default=0.0)
+        risk += np.array([p.preferred_communication == "email" for p in patients]) * 0.05
+        risk += np.array([p.status == PatientStatus.HIGH_RISK for p in patients]) * 0.3
+        risk += np.array([
+            not p.emergency_contact or len(p.emergency_contact.strip()) < 5 for p in patients
+        ]) * 0.1
+        return np.clip(risk, 0.0, 1.0)
+    
     def _calculate_financial_risk(self, patient: Patient, appointment: Appointment) -> float:
         """Calculate risk based on insurance and financial factors"""
         risk = 0.0
@@ -164,8 +336,7 @@ class NoShowPredictor:
             risk += 0.2
         
         # Insurance provider reliability
-        unreliable_providers = ["medicaid", "medicare", "self_pay"]
-        if patient.insurance_provider.lower() in unreliable_providers:
+        if patient.insurance_provider_casefold in _UNRELIABLE_PROVIDERS:
             risk += 0.1
         
         # Insurance number format (basic validation)
@@ -175,20 +346,45 @@ class NoShowPredictor:
         return min(1.0, risk)
     
     def get_high_risk_appointments(self, risk_threshold: float = 0.6) -> List[Tuple[Appointment, NoShowPrediction]]:
-        """Get appointments with high no-show risk"""
-        appointments = self.db.get_appointments()
-        high_risk_appointments = []
+        """Get upcoming appointments with high no-show risk"""
+        # One clock snapshot for the upcoming filter and any scoring
+        now = datetime.now()
+        
+        # Cheap filters first: only upcoming scheduled/confirmed appointments
+        candidates = [
+            appointment for appointment in self.db.iter_appointments(start_date=now)
+            if appointment.status in _ACTIVE_STATUSES
+        ]
+        
+        # One load for all existing predictions instead of one per appointment
+        predictions = self.db.get_predictions_by_ids([a.id for a in candidates])
+        
+        # Only score missing predictions whose historical risk alone leaves the
+        # threshold reachable; the other terms add at most _MAX_NON_HISTORICAL_SCORE
+        historical_weight = float(_RISK_WEIGHTS[0])
+        missing = [
+            a for a in candidates
+            if a.id not in predictions and
+            self._cached_historical_risk(a.patient_id, now) * historical_weight
+            + _MAX_NON_HISTORICAL_SCORE >= risk_threshold
+        ]
+        if missing:
+            # Generate predictions that don't exist yet in one batch, sharing one patient load
+            patients = {p.id: p for p in self.db.get_patients()}
+            loaded = []
+            for appointment in missing:
+                patient = patients.get(appointment.patient_id)
+                if not patient:
+                    raise ValueError("Patient or appointment not found")
+                loaded.append((patient, appointment))
+            for prediction in self._predict_loaded_batch(loaded, now):
+                predictions[prediction.appointment_id] = prediction
         
-        for appointment in appointments:
-            if appointment.status in [AppointmentStatus.SCHEDULED, AppointmentStatus.CONFIRMED]:
-                prediction = self.db.get_no_show_prediction(appointment.id)
-                
-                if not prediction:
-                    # Generate prediction if it doesn't exist
-                    prediction = self.predict_no_show_risk(appointment.patient_id, appointment.id)
-                
-                if prediction.risk_score >= risk_threshold:
-                    high_risk_appointments.append((appointment, prediction))
+        high_risk_appointments = []
+        for appointment in candidates:
+            prediction = predictions.get(appointment.id)
+            if prediction and prediction.risk_score >= risk_threshold:
+                high_risk_appointments.append((appointment, prediction))
         
         return high_risk_appointments
     
@@ -205,15 +401,17 @@ class NoShowPredictor:
             recommendations.append("Send confirmation call 24 hours before")
             recommendations.append("Verify insurance information")
         
-        if "High historical no-show rate" in prediction.risk_factors:
+        risk_factor_mask = prediction.risk_factor_mask
+        
+        if risk_factor_mask & _HISTORICAL_RISK_BIT:
             recommendations.append("Require deposit or pre-payment")
             recommendations.append("Schedule during preferred time slots")
         
-        if "Unfavorable appointment timing" in prediction.risk_factors:
+        if risk_factor_mask & _TIMING_RISK_BIT:
             recommendations.append("Offer alternative time slots")
             recommendations.append("Send extra reminder for timing")
         
-        if "Insurance/financial concerns" in prediction.risk_factors:
+        if risk_factor_mask & _FINANCIAL_RISK_BIT:
             recommendations.append("Verify insurance coverage")
             recommendations.append("Discuss payment options")
         
@@ -221,12 +419,13 @@ class NoShowPredictor:
     
     def calculate_clinic_no_show_rate(self, start_date: datetime, end_date: datetime) -> Dict:
         """Calculate overall clinic no-show statistics"""
-        appointments = self.db.get_appointments(start_date=start_date, end_date=end_date)
+        # One bincount over the packed status codes of the date window
+        counts = self.db.count_appointments_by_status(start_date=start_date, end_date=end_date)
         
-        total_appointments = len(appointments)
-        no_shows = sum(1 for a in appointments if a.status == AppointmentStatus.NO_SHOW)
-        completed = sum(1 for a in appointments if a.status == AppointmentStatus.COMPLETED)
-        cancelled = sum(1 for a in appointments if a.status == AppointmentStatus.CANCELLED)
+        total_appointments = sum(counts.values())
+        no_shows = counts[AppointmentStatus.NO_SHOW]
+        completed = counts[AppointmentStatus.COMPLETED]
+        cancelled = counts[AppointmentStatus.CANCELLED]
         
         # Calculate rates
         no_show_rate = (no_shows / total_appointments * 100) if total_appointments > 0 else 0
@@ -254,22 +453,21 @@ class NoShowPredictor:
         if not patient:
             return {}
         
-        # Get all appointments for this patient
-        appointments = self.db.get_appointments(patient_id=patient_id)
+        # Get all appointments for this patient as columns
+        columns = self.db.get_appointments_dataframe(patient_id=patient_id)
+        statuses = columns['status']
         
         # Calculate various metrics
-        total_appointments = len(appointments)
-        no_shows = sum(1 for a in appointments if a.status == AppointmentStatus.NO_SHOW)
-        completed = sum(1 for a in appointments if a.status == AppointmentStatus.COMPLETED)
+        total_appointments = int(statuses.size)
+        no_shows = int(np.count_nonzero(statuses == AppointmentStatus.NO_SHOW.label))
+        completed = int(np.count_nonzero(statuses == AppointmentStatus.COMPLETED.label))
         
         no_show_rate = (no_shows / total_appointments * 100) if total_appointments > 0 else 0
         
         # Get most recent prediction if available
-        recent_appointments = [a for a in appointments 
-                             if a.status in [AppointmentStatus.SCHEDULED, AppointmentStatus.CONFIRMED]]
+        latest_appointment = self.db.get_latest_active_appointment(patient_id)
         latest_prediction = None
-        if recent_appointments:
-            latest_appointment = max(recent_appointments, key=lambda x: x.appointment_datetime)
+        if latest_appointment:
             latest_prediction = self.db.get_no_show_prediction(latest_appointment.id)
         
         return {
@@ -1,105 +1,524 @@
 """
 Automated Reminder and Notification Service for the Medical Appointment Scheduling AI Agent
 """
-import smtplib
+import asyncio
+import functools
+import logging
+import logging.handlers
+import random
 import json
+import sys
+import threading
+import time
+from bisect import bisect_left
+from operator import attrgetter
+from string import Template
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from models import Patient, Doctor, Appointment, AppointmentStatus
+from types import ModuleType
+from typing import TYPE_CHECKING, Any, Callable, List, Dict, Optional, TextIO, Tuple
+import numpy as np
+from models import Patient, Doctor, Appointment, AppointmentStatus, NoShowPrediction, ClinicSettings
 from database import MedicalDatabase
 from no_show_predictor import NoShowPredictor
 
+if TYPE_CHECKING:
+    import smtplib
+
+logger = logging.getLogger(__name__)
+
+# smtplib and email.mime are imported on the first real send, so processes that
+# never email (or have nothing to send) skip loading them
+_smtplib: Optional[ModuleType] = None
+_mime_classes: Optional[Tuple[type, type]] = None
+
+
+def _smtp_module() -> ModuleType:
+    """The smtplib module, imported on first use"""
+    global _smtplib
+    if _smtplib is None:
+        import smtplib
+        _smtplib = smtplib
+    return _smtplib
+
+
+def _mime() -> Tuple[type, type]:
+    """(MIMEMultipart, MIMEText), imported on first use"""
+    global _mime_classes
+    if _mime_classes is None:
+        from email.mime.multipart import MIMEMultipart
+        from email.mime.text import MIMEText
+        _mime_classes = (MIMEMultipart, MIMEText)
+    return _mime_classes
+
+
+def _quit_smtp(smtp: 'smtplib.SMTP') -> None:
+    """End an SMTP session, closing the socket outright if QUIT fails"""
+    try:
+        smtp.quit()
+    except OSError:
+        smtp.close()
+
+
+# SMTP replies worth retrying: rate limits, busy mailboxes and temporary policy blocks
+_TRANSIENT_SMTP_CODES = frozenset({421, 450, 451, 452, 454, 554})
+
+
+def _retry_transient_smtp(tries: int = 3, base: float = 0.5, cap: float = 8.0) -> Callable:
+    """Retry an SMTP call on disconnects, socket errors and transient reply codes,
+    with jittered exponential backoff
+    
+    A failed send discards its session, so the next attempt reconnects.
+    """
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            for attempt in range(tries):
+                try:
+                    return func(*args, **kwargs)
+                except Exception as e:
+                    smtplib = _smtp_module()
+                    # SMTPException subclasses OSError; only bare socket errors count here
+                    transient = (isinstance(e, smtplib.SMTPServerDisconnected) or
+                                 (isinstance(e, OSError) and not isinstance(e, smtplib.SMTPException)) or
+                                 (isinstance(e, smtplib.SMTPResponseException) and
+                                  e.smtp_code in _TRANSIENT_SMTP_CODES))
+                    if not transient or attempt == tries - 1:
+                        raise
+                    logger.info("Transient SMTP error, retrying: %s", e)
+                    time.sleep(random.uniform(0, min(cap, base * 2 ** attempt)))
+        return wrapper
+    return decorator
+
+
+# Batches at least this large give up once most sends are failing
+_ABORT_MIN_BATCH = 30
+
+# Reminder tone by no-show risk: scores above each threshold move up one label
+_RISK_THRESHOLDS = [0.4, 0.7]
+_RISK_LABELS = ["low", "medium", "high"]
+
+
+def configure_logging(stream: Optional[TextIO] = None, capacity: int = 1024) -> logging.Handler:
+    """Print notification logs to a stream (stdout by default), buffering records between batches
+    
+    Records are held in memory and written out when the buffer fills, when an error
+    is logged, when a reminder batch finishes, or after a send made outside a batch.
+    NotificationService calls this itself when no logging has been set up at all.
+    """
+    target = logging.StreamHandler(stream if stream is not None else sys.stdout)
+    target.setFormatter(logging.Formatter('%(message)s'))
+    handler = logging.handlers.MemoryHandler(capacity, target=target)
+    for existing in [h for h in logger.handlers if isinstance(h, logging.handlers.MemoryHandler)]:
+        logger.removeHandler(existing)
+        existing.close()
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    return handler
+
+
+def _flush_logs() -> None:
+    """Write out any buffered notification log records"""
+    for handler in logger.handlers:
+        handler.flush()
+
+
+# Email bodies, compiled once at import and filled per message
+_STANDARD_REMINDER_EMAIL = Template("""\
+Dear $first_name,
+
+This is a friendly reminder about your upcoming appointment:
+
+Doctor: Dr. $doctor_first_name $doctor_last_name
+Specialty: $specialty
+Date & Time: $appointment_time
+Duration: $duration minutes
+Appointment Type: $appointment_type
+
+Please arrive 15 minutes early for check-in. If you need to reschedule or cancel, please call us at least 24 hours in advance.
+
+We look forward to seeing you!
+
+Best regards,
+$clinic_name""")
+
+_HIGH_RISK_REMINDER_EMAIL = Template("""\
+Dear $first_name,
+
+IMPORTANT: This is an urgent reminder about your upcoming appointment:
+
+Doctor: Dr. $doctor_first_name $doctor_last_name
+Specialty: $specialty
+Date & Time: $appointment_time
+Duration: $duration minutes
+Appointment Type: $appointment_type
+
+Please confirm your attendance by replying to this email or calling us immediately. If you need to reschedule, please contact us as soon as possible.
+
+We understand that circumstances can change, but please let us know so we can help other patients who may need this time slot.
+
+Thank you for your attention to this matter.
+
+Best regards,
+$clinic_name""")
+
+_CONFIRMATION_EMAIL = Template("""\
+Dear $first_name,
+
+Please confirm your appointment for tomorrow:
+
+Doctor: Dr. $doctor_first_name $doctor_last_name
+Date & Time: $appointment_time
+Duration: $duration minutes
+
+Please reply to this email with "CONFIRM" to confirm your appointment, or "CANCEL" if you need to cancel.
+
+If you need to reschedule, please call us as soon as possible.
+
+Thank you!
+
+Best regards,
+$clinic_name""")
+
+_NO_SHOW_FOLLOWUP_EMAIL = Template("""\
+Dear $first_name,
+
+We noticed you missed your appointment with Dr. $doctor_last_name on $appointment_time.
+
+We understand that things come up, and we're here to help. Please call us to reschedule your appointment at your convenience.
+
+We're committed to providing you with the best care, and we look forward to seeing you soon.
+
+Best regards,
+$clinic_name""")
+
+_CANCELLATION_EMAIL = Template("""\
+Dear $first_name,
+
+Your appointment with Dr. $doctor_last_name on $appointment_time has been cancelled.
+
+$reason_line
+
+Please call us to reschedule at your convenience.
+
+Best regards,
+$clinic_name""")
+
+# Every notification the service sends, by template key and channel. Email entries
+# carry subject and body templates (log_body: whether the body is logged after
+# sending); SMS and phone entries carry the message template. 'log' and 'error'
+# label the log lines.
+_NOTIFICATIONS: Dict[str, Dict[str, Dict[str, Any]]] = {
+    'reminder': {
+        'email': {
+            'log': "EMAIL REMINDER SENT", 'error': "email reminder",
+            'subject': Template("Appointment Reminder - $doctor_first_name $doctor_last_name"),
+            'body': _STANDARD_REMINDER_EMAIL, 'log_body': True,
+        },
+        'sms': {
+            'log': "SMS REMINDER SENT", 'error': "SMS reminder",
+            'message': Template("Reminder: Your appointment with Dr. $doctor_last_name is tomorrow at $appointment_time. Reply YES to confirm."),
+        },
+        'phone': {
+            'log': "PHONE REMINDER SENT", 'error': "phone reminder",
+            'message': Template("Reminder: Your appointment with Dr. $doctor_last_name is tomorrow at $appointment_time. Please call us to confirm."),
+        },
+    },
+    'reminder_high': {
+        'email': {
+            'log': "EMAIL REMINDER SENT", 'error': "email reminder",
+            'subject': Template("URGENT: Appointment Reminder - $doctor_first_name $doctor_last_name"),
+            'body': _HIGH_RISK_REMINDER_EMAIL, 'log_body': True,
+        },
+        'sms': {
+            'log': "SMS REMINDER SENT", 'error': "SMS reminder",
+            'message': Template("URGENT: Your appointment with Dr. $doctor_last_name is tomorrow at $appointment_time. Please confirm by replying YES or call us to reschedule."),
+        },
+        'phone': {
+            'log': "PHONE REMINDER SENT", 'error': "phone reminder",
+            'message': Template("URGENT: Your appointment with Dr. $doctor_last_name is tomorrow at $appointment_time. Please call us to confirm or reschedule."),
+        },
+    },
+    'confirmation': {
+        'email': {
+            'log': "EMAIL CONFIRMATION SENT", 'error': "email confirmation",
+            'subject': Template("Please Confirm Your Appointment - $doctor_first_name $doctor_last_name"),
+            'body': _CONFIRMATION_EMAIL, 'log_body': True,
+        },
+        'sms': {
+            'log': "SMS CONFIRMATION SENT", 'error': "SMS confirmation",
+            'message': Template("Please confirm your appointment with Dr. $doctor_last_name tomorrow at $appointment_time. Reply YES to confirm or NO to cancel."),
+        },
+        'phone': {
+            'log': "PHONE CONFIRMATION SENT", 'error': "phone confirmation",
+            'message': Template("Please confirm your appointment with Dr. $doctor_last_name tomorrow at $appointment_time. Call us to confirm or cancel."),
+        },
+    },
+    'no_show_followup': {
+        'email': {
+            'log': "NO-SHOW FOLLOW-UP EMAIL SENT", 'error': "no-show follow-up email",
+            'subject': Template("We Missed You - Reschedule Your Appointment"),
+            'body': _NO_SHOW_FOLLOWUP_EMAIL, 'log_body': False,
+        },
+        'sms': {
+            'log': "NO-SHOW FOLLOW-UP SMS SENT", 'error': "no-show follow-up SMS",
+            'message': Template("We missed you at your appointment with Dr. $doctor_last_name. Please call us to reschedule. We're here to help!"),
+        },
+        'phone': {
+            'log': "NO-SHOW FOLLOW-UP PHONE CALL", 'error': "no-show follow-up phone call",
+            'message': Template("We missed you at your appointment with Dr. $doctor_last_name. Please call us to reschedule. We're here to help!"),
+        },
+    },
+    'cancellation': {
+        'email': {
+            'log': "CANCELLATION EMAIL SENT", 'error': "cancellation email",
+            'subject': Template("Appointment Cancelled - $doctor_first_name $doctor_last_name"),
+            'body': _CANCELLATION_EMAIL, 'log_body': False,
+        },
+        'sms': {
+            'log': "CANCELLATION SMS SENT", 'error': "cancellation SMS",
+            'message': Template("Your appointment with Dr. $doctor_last_name has been cancelled. Please call us to reschedule."),
+        },
+        'phone': {
+            'log': "CANCELLATION PHONE CALL", 'error': "cancellation phone call",
+            'message': Template("Your appointment with Dr. $doctor_last_name has been cancelled. Please call us to reschedule."),
+        },
+    },
+}
+
+# Patient contact detail each channel sends to
+_CHANNEL_TARGETS = {
+    'email': attrgetter('email'),
+    'sms': attrgetter('phone'),
+    'phone': attrgetter('phone'),
+}
+
 
 class NotificationService:
     """Automated notification and reminder service"""
     
-    def __init__(self, database: MedicalDatabase, no_show_predictor: NoShowPredictor):
+    def __init__(self, database: MedicalDatabase, no_show_predictor: NoShowPredictor,
+                 max_concurrency: int = 8):
         self.db = database
         self.no_show_predictor = no_show_predictor
-        self.smtp_config = {
+        # Upper bound on concurrent sends, to respect provider rate limits
+        self.max_concurrency = max_concurrency
+        # The file-based database is not thread-safe; worker threads hold this
+        # lock for database access and release it while sending
+        self._db_lock = threading.RLock()
+        self.smtp_config: Dict[str, Any] = {
             'server': 'smtp.gmail.com',
             'port': 587,
             'username': '',  # To be configured
             'password': ''   # To be configured
         }
+        # One SMTP session per sending thread, opened lazily and reused across
+        # emails; _smtp_sessions tracks them all so a batch can close them
+        self._smtp_local = threading.local()
+        self._smtp_sessions: List['smtplib.SMTP'] = []
+        self._smtp_sessions_lock = threading.Lock()
+        # Appointments modified during a batch, keyed by ID and written back once
+        # when the batch ends; None outside a batch, where updates go straight out
+        self._pending_updates: Optional[Dict[str, Appointment]] = None
+        # Clinic settings memoized per database settings version
+        self._settings_cache: Optional[ClinicSettings] = None
+        self._settings_version: Optional[int] = None
+        # Send logs need a handler to go anywhere; keep any logging the host already set up
+        if not logger.handlers and not logging.getLogger().handlers:
+            configure_logging()
     
-    def send_appointment_reminder(self, appointment_id: str) -> bool:
-        """Send appointment reminder to patient"""
-        appointment = self.db.get_appointment(appointment_id)
-        if not appointment:
-            return False
+    def _get_smtp_connection(self) -> 'smtplib.SMTP':
+        """Return this thread's SMTP session, connecting if it has none
         
-        patient = self.db.get_patient(appointment.patient_id)
-        doctor = self.db.get_doctor(appointment.doctor_id)
+        The session is not probed before use; a send that fails discards it instead.
+        """
+        smtplib = _smtp_module()
+        smtp = getattr(self._smtp_local, 'smtp', None)
+        if smtp is not None:
+            return smtp
         
-        if not patient or not doctor:
-            return False
+        smtp = smtplib.SMTP(self.smtp_config['server'], self.smtp_config['port'])
+        smtp.starttls()
+        smtp.login(self.smtp_config['username'], self.smtp_config['password'])
+        self._smtp_local.smtp = smtp
+        with self._smtp_sessions_lock:
+            self._smtp_sessions.append(smtp)
+        return smtp
+    
+    def _discard_smtp_connection(self, smtp: 'smtplib.SMTP') -> None:
+        """Close a session that failed a send and forget it, so this thread reconnects next time"""
+        if getattr(self._smtp_local, 'smtp', None) is smtp:
+            self._smtp_local.smtp = None
+        with self._smtp_sessions_lock:
+            if smtp in self._smtp_sessions:
+                self._smtp_sessions.remove(smtp)
+        _quit_smtp(smtp)
+    
+    def _close_smtp_connection(self) -> None:
+        """Close every open SMTP session"""
+        with self._smtp_sessions_lock:
+            sessions, self._smtp_sessions = self._smtp_sessions, []
+        for smtp in sessions:
+            _quit_smtp(smtp)
+        # Threads that outlive the batch reconnect on their next send
+        self._smtp_local = threading.local()
+    
+    def _settings(self) -> Optional[ClinicSettings]:
+        """Clinic settings, reloaded only after a settings write or an explicit invalidation"""
+        with self._db_lock:
+            if self._settings_version != self.db.settings_version:
+                self._settings_cache = self.db.get_clinic_settings()
+                self._settings_version = self.db.settings_version
+            return self._settings_cache
+    
+    def _invalidate_settings(self) -> None:
+        """Force the next _settings() call to reload from the database"""
+        with self._db_lock:
+            self._settings_version = None
+    
+    def _clinic_name(self) -> str:
+        """Clinic name used to sign outgoing messages"""
+        settings = self._settings()
+        return settings.clinic_name if settings else 'Medical Clinic'
+    
+    @property
+    def _sends_email(self) -> bool:
+        """Whether emails really go out, which needs SMTP credentials"""
+        return bool(self.smtp_config['username'])
+    
+    @_retry_transient_smtp()
+    def _deliver_email(self, recipient: str, subject: str, body: str) -> None:
+        """Send an email over the shared SMTP session (no-op until SMTP is configured)"""
+        if not self._sends_email:
+            return
         
-        # Check if reminder already sent
-        if appointment.reminder_sent:
-            return True
+        MIMEMultipart, MIMEText = _mime()
+        msg = MIMEMultipart()
+        msg['From'] = self.smtp_config['username']
+        settings = self._settings()
+        if settings and settings.email:
+            msg['Reply-To'] = settings.email
+        msg['To'] = recipient
+        msg['Subject'] = subject
+        msg.attach(MIMEText(body, 'plain'))
+        smtp = self._get_smtp_connection()
+        try:
+            smtp.send_message(msg)
+        except OSError:
+            # Covers SMTPException too; the session may be half-dead, so drop it
+            # and let the retry (or the next send) reconnect
+            self._discard_smtp_connection(smtp)
+            raise
+    
+    def send_appointment_reminder(self, appointment_id: str,
+                                  patients: Optional[Dict[str, Patient]] = None,
+                                  doctors: Optional[Dict[str, Doctor]] = None,
+                                  predictions: Optional[Dict[str, NoShowPrediction]] = None) -> bool:
+        """Send appointment reminder to patient
         
-        # Get no-show prediction for personalized messaging
-        prediction = self.db.get_no_show_prediction(appointment_id)
-        risk_level = "low"
-        if prediction:
-            if prediction.risk_score > 0.7:
-                risk_level = "high"
-            elif prediction.risk_score > 0.4:
-                risk_level = "medium"
+        Batch callers pass prefetched patients, doctors and predictions keyed by ID
+        to skip the per-appointment lookups.
+        """
+        with self._db_lock:
+            appointment = self._load_appointment(appointment_id)
+            if not appointment:
+                return False
+            
+            # Check if reminder already sent, before fetching anything else
+            if appointment.reminder_sent:
+                return True
+            
+            patient, doctor = self._lookup_participants(appointment, patients, doctors)
+            
+            if not patient or not doctor:
+                return False
+            
+            # Get no-show prediction for personalized messaging
+            prediction: Optional[NoShowPrediction]
+            if predictions is not None:
+                prediction = predictions.get(appointment_id)
+            else:
+                prediction = self.db.get_no_show_prediction(appointment_id)
+        
+        risk_level = _RISK_LABELS[bisect_left(_RISK_THRESHOLDS, prediction.risk_score)] if prediction else "low"
         
         # Send based on patient's preferred communication method
-        success = False
-        if patient.preferred_communication == "email":
-            success = self._send_email_reminder(patient, doctor, appointment, risk_level)
-        elif patient.preferred_communication == "sms":
-            success = self._send_sms_reminder(patient, doctor, appointment, risk_level)
-        else:  # phone
-            success = self._send_phone_reminder(patient, doctor, appointment, risk_level)
+        template_key = 'reminder_high' if risk_level == "high" else 'reminder'
+        success = self._notify(patient.preferred_communication, template_key, patient, doctor, appointment)
         
         # Update appointment if reminder sent successfully
         if success:
             appointment.reminder_sent = True
             appointment.updated_at = datetime.now()
-            self.db.update_appointment(appointment)
+            self._save_appointment(appointment)
         
         return success
     
-    def send_appointment_confirmation(self, appointment_id: str) -> bool:
+    def send_appointment_confirmation(self, appointment_id: str,
+                                      patients: Optional[Dict[str, Patient]] = None,
+                                      doctors: Optional[Dict[str, Doctor]] = None) -> bool:
         """Send appointment confirmation request"""
-        appointment = self.db.get_appointment(appointment_id)
-        if not appointment:
-            return False
-        
-        patient = self.db.get_patient(appointment.patient_id)
-        doctor = self.db.get_doctor(appointment.doctor_id)
-        
-        if not patient or not doctor:
-            return False
-        
-        # Check if confirmation already sent
-        if appointment.confirmation_sent:
-            return True
+        with self._db_lock:
+            appointment = self._load_appointment(appointment_id)
+            if not appointment:
+                return False
+            
+            # Check if confirmation already sent, before fetching anything else
+            if appointment.confirmation_sent:
+                return True
+            
+            patient, doctor = self._lookup_participants(appointment, patients, doctors)
+            
+            if not patient or not doctor:
+                return False
         
         # Send confirmation based on patient's preferred communication
-        success = False
-        if patient.preferred_communication == "email":
-            success = self._send_email_confirmation(patient, doctor, appointment)
-        elif patient.preferred_communication == "sms":
-            success = self._send_sms_confirmation(patient, doctor, appointment)
-        else:  # phone
-            success = self._send_phone_confirmation(patient, doctor, appointment)
+        success = self._notify(patient.preferred_communication, 'confirmation', patient, doctor, appointment)
         
         # Update appointment if confirmation sent successfully
         if success:
             appointment.confirmation_sent = True
             appointment.updated_at = datetime.now()
-            self.db.update_appointment(appointment)
+            self._save_appointment(appointment)
         
         return success
     
+    def _load_appointment(self, appointment_id: str) -> Optional[Appointment]:
+        """Get an appointment, preferring a copy modified earlier in the current batch"""
+        with self._db_lock:
+            if self._pending_updates is not None and appointment_id in self._pending_updates:
+                return self._pending_updates[appointment_id]
+            return self.db.get_appointment(appointment_id)
+    
+    def _save_appointment(self, appointment: Appointment) -> None:
+        """Write an appointment back, deferring to the batch flush when one is running"""
+        with self._db_lock:
+            if self._pending_updates is not None:
+                self._pending_updates[appointment.id] = appointment
+            else:
+                self.db.update_appointment(appointment)
+    
+    def _flush_pending_updates(self) -> None:
+        """Write every appointment modified in the batch in one go and leave batch mode"""
+        with self._db_lock:
+            pending, self._pending_updates = self._pending_updates, None
+            if pending:
+                self.db.update_appointments_bulk(list(pending.values()))
+    
+    def _lookup_participants(self, appointment: Appointment,
+                             patients: Optional[Dict[str, Patient]],
+                             doctors: Optional[Dict[str, Doctor]]) -> Tuple[Optional[Patient], Optional[Doctor]]:
+        """Patient and doctor for an appointment, from prefetched maps when given"""
+        if patients is not None:
+            patient = patients.get(appointment.patient_id)
+        else:
+            patient = self.db.get_patient(appointment.patient_id)
+        if doctors is not None:
+            doctor = doctors.get(appointment.doctor_id)
+        else:
+            doctor = self.db.get_doctor(appointment.doctor_id)
+        return patient, doctor
+    
     def send_no_show_follow_up(self, appointment_id: str) -> bool:
         """Send follow-up message after a no-show"""
         appointment = self.db.get_appointment(appointment_id)
@@ -113,13 +532,7 @@ class NotificationService:
             return False
         
         # Send follow-up message
-        success = False
-        if patient.preferred_communication == "email":
-            success = self._send_email_no_show_followup(patient, doctor, appointment)
-        elif patient.preferred_communication == "sms":
-            success = self._send_sms_no_show_followup(patient, doctor, appointment)
-        else:  # phone
-            success = self._send_phone_no_show_followup(patient, doctor, appointment)
+        success = self._notify(patient.preferred_communication, 'no_show_followup', patient, doctor, appointment)
         
         return success
     
@@ -136,30 +549,94 @@ class NotificationService:
             return False
         
         # Send cancellation notification
-        success = False
-        if patient.preferred_communication == "email":
-            success = self._send_email_cancellation(patient, doctor, appointment, reason)
-        elif patient.preferred_communication == "sms":
-            success = self._send_sms_cancellation(patient, doctor, appointment, reason)
-        else:  # phone
-            success = self._send_phone_cancellation(patient, doctor, appointment, reason)
+        success = self._notify(patient.preferred_communication, 'cancellation', patient, doctor, appointment,
+                               reason_line=f'Reason: {reason}' if reason else '')
         
         return success
     
-    def process_scheduled_reminders(self) -> Dict:
+    def process_scheduled_reminders(self, now: Optional[datetime] = None) -> Dict:
         """Process all appointments that need reminders"""
-        settings = self.db.get_clinic_settings()
-        if not settings:
+        prepared = self._prepare_reminder_batch(now)
+        if prepared is None:
             return {'error': 'Clinic settings not configured'}
+        results, reminder_ids, confirmation_ids, prefetched = prepared
         
-        # Get appointments needing reminders
-        appointments_needing_reminders = self.db.get_appointments_needing_reminders(
-            settings.reminder_hours_before
-        )
+        if prefetched:
+            patients, doctors, predictions = prefetched
+            batch_size = max(len(reminder_ids), len(confirmation_ids))
+            try:
+                with ThreadPoolExecutor(max_workers=min(batch_size, self.max_concurrency)) as pool:
+                    # Send reminders; confirmations run afterwards so the two never
+                    # update the same appointment concurrently
+                    futures = {
+                        pool.submit(self.send_appointment_reminder, appointment_id, patients, doctors, predictions): appointment_id
+                        for appointment_id in reminder_ids
+                    }
+                    self._collect_outcomes(futures, results, 'reminder')
+                    
+                    # Send confirmations
+                    futures = {
+                        pool.submit(self.send_appointment_confirmation, appointment_id, patients, doctors): appointment_id
+                        for appointment_id in confirmation_ids
+                    }
+                    self._collect_outcomes(futures, results, 'confirmation')
+            finally:
+                self._end_send_batch()
+        
+        return self._finish_batch(results)
+    
+    async def process_scheduled_reminders_async(self, now: Optional[datetime] = None) -> Dict:
+        """Thread-offload variant of process_scheduled_reminders for callers already on an event loop
+        
+        Each send still runs the blocking SMTP client, on a worker thread via
+        asyncio.to_thread, so the loop stays free but no I/O is truly async.
+        Run from synchronous code with asyncio.run(service.process_scheduled_reminders_async()).
+        """
+        prepared = self._prepare_reminder_batch(now)
+        if prepared is None:
+            return {'error': 'Clinic settings not configured'}
+        results, reminder_ids, confirmation_ids, prefetched = prepared
+        
+        if prefetched:
+            patients, doctors, predictions = prefetched
+            # Bound in-flight sends to respect provider rate limits
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            try:
+                # Reminders complete before confirmations start, as in the threaded path
+                await self._run_phase_async(results, 'reminder', semaphore, self.send_appointment_reminder,
+                                            reminder_ids, patients, doctors, predictions)
+                await self._run_phase_async(results, 'confirmation', semaphore, self.send_appointment_confirmation,
+                                            confirmation_ids, patients, doctors)
+            finally:
+                self._end_send_batch()
+        
+        return self._finish_batch(results)
+    
+    def _prepare_reminder_batch(self, now: Optional[datetime]
+                                ) -> Optional[Tuple[Dict, List[str], List[str], Tuple]]:
+        """Query what a reminder run has to send, shared by the threaded and async paths
+        
+        Returns None when clinic settings are missing, otherwise the zeroed results,
+        the reminder and confirmation appointment ids, and the prefetched
+        (patients, doctors, predictions), which is empty when there is nothing to send.
+        """
+        # Pick up settings edited outside this process, then reuse them for the batch
+        self._invalidate_settings()
+        settings = self._settings()
+        if not settings:
+            return None
+        
+        # One clock snapshot so both queries see the same window
+        if now is None:
+            now = datetime.now()
+        
+        # Get appointments needing reminders, as columns masked down to unsent rows
+        reminder_batch = self.db.get_reminder_batch_soa(settings.reminder_hours_before, now=now)
+        due_reminders = np.flatnonzero(~reminder_batch['reminder_sent'])
         
         # Get appointments needing confirmation
         appointments_needing_confirmation = self.db.get_appointments_needing_confirmation(
-            settings.confirmation_hours_before
+            settings.confirmation_hours_before, now=now
         )
         
         results = {
@@ -169,321 +646,145 @@ class NotificationService:
             'confirmation_failures': 0,
             'high_risk_appointments': 0
         }
+        reminder_ids = [reminder_batch['ids'][i] for i in due_reminders]
+        confirmation_ids = [a.id for a in appointments_needing_confirmation]
         
-        # Send reminders
-        for appointment in appointments_needing_reminders:
-            try:
-                if self.send_appointment_reminder(appointment.id):
-                    results['reminders_sent'] += 1
-                else:
-                    results['reminder_failures'] += 1
-            except Exception as e:
-                results['reminder_failures'] += 1
-                print(f"Error sending reminder for appointment {appointment.id}: {e}")
-        
-        # Send confirmations
-        for appointment in appointments_needing_confirmation:
-            try:
-                if self.send_appointment_confirmation(appointment.id):
-                    results['confirmations_sent'] += 1
-                else:
-                    results['confirmation_failures'] += 1
-            except Exception as e:
-                results['confirmation_failures'] += 1
-                print(f"Error sending confirmation for appointment {appointment.id}: {e}")
-        
-        # Check for high-risk appointments
-        high_risk_appointments = self.no_show_predictor.get_high_risk_appointments()
-        results['high_risk_appointments'] = len(high_risk_appointments)
+        # Nothing to send: skip the prefetch and the SMTP teardown
+        prefetched = ()
+        if reminder_ids or confirmation_ids:
+            prefetched = self._prefetch_batch(reminder_batch, due_reminders, appointments_needing_confirmation)
+            self._pending_updates = {}
         
-        return results
-    
-    def _send_email_reminder(self, patient: Patient, doctor: Doctor, 
-                           appointment: Appointment, risk_level: str) -> bool:
-        """Send email reminder"""
-        try:
-            # Create email content based on risk level
-            if risk_level == "high":
-                subject = f"URGENT: Appointment Reminder - {doctor.first_name} {doctor.last_name}"
-                body = self._get_high_risk_reminder_email(patient, doctor, appointment)
-            else:
-                subject = f"Appointment Reminder - {doctor.first_name} {doctor.last_name}"
-                body = self._get_standard_reminder_email(patient, doctor, appointment)
-            
-            # Send email (simulated for demo)
-            print(f"EMAIL REMINDER SENT to {patient.email}")
-            print(f"Subject: {subject}")
-            print(f"Body: {body[:200]}...")
-            
-            return True
-        except Exception as e:
-            print(f"Error sending email reminder: {e}")
-            return False
-    
-    def _send_sms_reminder(self, patient: Patient, doctor: Doctor, 
-                          appointment: Appointment, risk_level: str) -> bool:
-        """Send SMS reminder"""
-        try:
-            appointment_time = appointment.appointment_datetime.strftime("%B %d, %Y at %I:%M %p")
-            
-            if risk_level == "high":
-                message = f"URGENT: Your appointment with Dr. {doctor.last_name} is tomorrow at {appointment_time}. Please confirm by replying YES or call us to reschedule."
-            else:
-                message = f"Reminder: Your appointment with Dr. {doctor.last_name} is tomorrow at {appointment_time}. Reply YES to confirm."
-            
-            # Send SMS (simulated for demo)
-            print(f"SMS REMINDER SENT to {patient.phone}")
-            print(f"Message: {message}")
-            
-            return True
-        except Exception as e:
-            print(f"Error sending SMS reminder: {e}")
-            return False
-    
-    def _send_phone_reminder(self, patient: Patient, doctor: Doctor, 
-                           appointment: Appointment, risk_level: str) -> bool:
-        """Send phone reminder (simulated)"""
-        try:
-            appointment_time = appointment.appointment_datetime.strftime("%B %d, %Y at %I:%M %p")
-            
-            if risk_level == "high":
-                message = f"URGENT: Your appointment with Dr. {doctor.last_name} is tomorrow at {appointment_time}. Please call us to confirm or reschedule."
-            else:
-                message = f"Reminder: Your appointment with Dr. {doctor.last_name} is tomorrow at {appointment_time}. Please call us to confirm."
-            
-            # Simulate phone call
-            print(f"PHONE REMINDER SENT to {patient.phone}")
-            print(f"Message: {message}")
-            
-            return True
-        except Exception as e:
-            print(f"Error sending phone reminder: {e}")
-            return False
-    
-    def _send_email_confirmation(self, patient: Patient, doctor: Doctor, 
-                               appointment: Appointment) -> bool:
-        """Send email confirmation request"""
-        try:
-            subject = f"Please Confirm Your Appointment - {doctor.first_name} {doctor.last_name}"
-            body = self._get_confirmation_email(patient, doctor, appointment)
-            
-            print(f"EMAIL CONFIRMATION SENT to {patient.email}")
-            print(f"Subject: {subject}")
-            print(f"Body: {body[:200]}...")
-            
-            return True
-        except Exception as e:
-            print(f"Error sending email confirmation: {e}")
-            return False
+        return results, reminder_ids, confirmation_ids, prefetched
     
-    def _send_sms_confirmation(self, patient: Patient, doctor: Doctor, 
-                             appointment: Appointment) -> bool:
-        """Send SMS confirmation request"""
-        try:
-            appointment_time = appointment.appointment_datetime.strftime("%B %d, %Y at %I:%M %p")
-            message = f"Please confirm your appointment with Dr. {doctor.last_name} tomorrow at {appointment_time}. Reply YES to confirm or NO to cancel."
-            
-            print(f"SMS CONFIRMATION SENT to {patient.phone}")
-            print(f"Message: {message}")
-            
-            return True
-        except Exception as e:
-            print(f"Error sending SMS confirmation: {e}")
-            return False
-    
-    def _send_phone_confirmation(self, patient: Patient, doctor: Doctor, 
-                               appointment: Appointment) -> bool:
-        """Send phone confirmation request"""
-        try:
-            appointment_time = appointment.appointment_datetime.strftime("%B %d, %Y at %I:%M %p")
-            message = f"Please confirm your appointment with Dr. {doctor.last_name} tomorrow at {appointment_time}. Call us to confirm or cancel."
-            
-            print(f"PHONE CONFIRMATION SENT to {patient.phone}")
-            print(f"Message: {message}")
-            
-            return True
-        except Exception as e:
-            print(f"Error sending phone confirmation: {e}")
-            return False
+    def _end_send_batch(self) -> None:
+        """Release a batch's SMTP sessions and write out its deferred updates and logs"""
+        # One SMTP session per worker for the whole batch
+        self._close_smtp_connection()
+        self._flush_pending_updates()
+        _flush_logs()
     
-    def _get_standard_reminder_email(self, patient: Patient, doctor: Doctor, 
-                                   appointment: Appointment) -> str:
-        """Generate standard reminder email content"""
-        appointment_time = appointment.appointment_datetime.strftime("%B %d, %Y at %I:%M %p")
-        
-        return f"""
-Dear {patient.first_name},
-
-This is a friendly reminder about your upcoming appointment:
-
-Doctor: Dr. {doctor.first_name} {doctor.last_name}
-Specialty: {doctor.specialty}
-Date & Time: {appointment_time}
-Duration: {appointment.duration} minutes
-Appointment Type: {appointment.appointment_type}
-
-Please arrive 15 minutes early for check-in. If you need to reschedule or cancel, please call us at least 24 hours in advance.
-
-We look forward to seeing you!
-
-Best regards,
-{self.db.get_clinic_settings().clinic_name if self.db.get_clinic_settings() else 'Medical Clinic'}
-        """.strip()
-    
-    def _get_high_risk_reminder_email(self, patient: Patient, doctor: Doctor, 
-                                    appointment: Appointment) -> str:
-        """Generate high-risk reminder email content"""
-        appointment_time = appointment.appointment_datetime.strftime("%B %d, %Y at %I:%M %p")
-        
-        return f"""
-Dear {patient.first_name},
-
-IMPORTANT: This is an urgent reminder about your upcoming appointment:
-
-Doctor: Dr. {doctor.first_name} {doctor.last_name}
-Specialty: {doctor.specialty}
-Date & Time: {appointment_time}
-Duration: {appointment.duration} minutes
-Appointment Type: {appointment.appointment_type}
-
-Please confirm your attendance by replying to this email or calling us immediately. If you need to reschedule, please contact us as soon as possible.
-
-We understand that circumstances can change, but please let us know so we can help other patients who may need this time slot.
-
-Thank you for your attention to this matter.
-
-Best regards,
-{self.db.get_clinic_settings().clinic_name if self.db.get_clinic_settings() else 'Medical Clinic'}
-        """.strip()
+    def _finish_batch(self, results: Dict) -> Dict:
+        """Fill in the high-risk count once a reminder run's sends are done"""
+        high_risk_appointments = self.no_show_predictor.get_high_risk_appointments()
+        results['high_risk_appointments'] = len(high_risk_appointments)
+        return results
     
-    def _get_confirmation_email(self, patient: Patient, doctor: Doctor, 
-                              appointment: Appointment) -> str:
-        """Generate confirmation email content"""
-        appointment_time = appointment.appointment_datetime.strftime("%B %d, %Y at %I:%M %p")
+    async def _run_phase_async(self, results: Dict, kind: str, semaphore: asyncio.Semaphore,
+                               send_method: Callable, appointment_ids: List[str], *prefetched: Any) -> None:
+        """Run one phase of sends on worker threads, tallying them and cancelling the rest once it is failing"""
+        async def send(appointment_id: str) -> bool:
+            async with semaphore:
+                return await asyncio.to_thread(send_method, appointment_id, *prefetched)
         
-        return f"""
-Dear {patient.first_name},
-
-Please confirm your appointment for tomorrow:
-
-Doctor: Dr. {doctor.first_name} {doctor.last_name}
-Date & Time: {appointment_time}
-Duration: {appointment.duration} minutes
-
-Please reply to this email with "CONFIRM" to confirm your appointment, or "CANCEL" if you need to cancel.
-
-If you need to reschedule, please call us as soon as possible.
-
-Thank you!
-
-Best regards,
-{self.db.get_clinic_settings().clinic_name if self.db.get_clinic_settings() else 'Medical Clinic'}
-        """.strip()
+        tasks = {asyncio.ensure_future(send(appointment_id)): appointment_id for appointment_id in appointment_ids}
+        pending = set(tasks)
+        aborted = False
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if not task.cancelled():
+                    self._record_send_outcome(results, kind, tasks[task], task.exception() or task.result())
+            if not aborted and self._batch_failing(results, kind, len(tasks)):
+                aborted = True
+                for task in pending:
+                    task.cancel()
     
-    def _send_email_no_show_followup(self, patient: Patient, doctor: Doctor, 
-                                   appointment: Appointment) -> bool:
-        """Send no-show follow-up email"""
-        try:
-            subject = f"We Missed You - Reschedule Your Appointment"
-            body = f"""
-Dear {patient.first_name},
-
-We noticed you missed your appointment with Dr. {doctor.last_name} on {appointment.appointment_datetime.strftime('%B %d, %Y at %I:%M %p')}.
-
-We understand that things come up, and we're here to help. Please call us to reschedule your appointment at your convenience.
-
-We're committed to providing you with the best care, and we look forward to seeing you soon.
-
-Best regards,
-{self.db.get_clinic_settings().clinic_name if self.db.get_clinic_settings() else 'Medical Clinic'}
-            """.strip()
-            
-            print(f"NO-SHOW FOLLOW-UP EMAIL SENT to {patient.email}")
-            print(f"Subject: {subject}")
-            
-            return True
-        except Exception as e:
-            print(f"Error sending no-show follow-up email: {e}")
-            return False
+    def _prefetch_batch(self, reminder_batch: Dict, due_reminders: np.ndarray,
+                        confirmations: List[Appointment]
+                        ) -> Tuple[Dict[str, Patient], Dict[str, Doctor], Dict[str, NoShowPrediction]]:
+        """Load the patients, doctors and reminder predictions a batch needs in one pass each"""
+        patient_ids = [reminder_batch['patient_ids'][i] for i in due_reminders]
+        patient_ids += [a.patient_id for a in confirmations]
+        doctor_ids = [reminder_batch['doctor_ids'][i] for i in due_reminders]
+        doctor_ids += [a.doctor_id for a in confirmations]
+        with self._db_lock:
+            patients = self.db.get_patients_by_ids(patient_ids)
+            doctors = self.db.get_doctors_by_ids(doctor_ids)
+            predictions = self.db.get_predictions_by_ids([reminder_batch['ids'][i] for i in due_reminders])
+        return patients, doctors, predictions
     
-    def _send_sms_no_show_followup(self, patient: Patient, doctor: Doctor, 
-                                 appointment: Appointment) -> bool:
-        """Send no-show follow-up SMS"""
-        try:
-            message = f"We missed you at your appointment with Dr. {doctor.last_name}. Please call us to reschedule. We're here to help!"
-            
-            print(f"NO-SHOW FOLLOW-UP SMS SENT to {patient.phone}")
-            print(f"Message: {message}")
-            
-            return True
-        except Exception as e:
-            print(f"Error sending no-show follow-up SMS: {e}")
-            return False
+    def _collect_outcomes(self, futures: Dict, results: Dict, kind: str) -> None:
+        """Tally a phase's sends as they finish, cancelling the rest once the phase is failing"""
+        aborted = False
+        for future in as_completed(futures):
+            if future.cancelled():
+                continue
+            self._record_send_outcome(results, kind, futures[future], future.exception() or future.result())
+            if not aborted and self._batch_failing(results, kind, len(futures)):
+                aborted = True
+                for pending in futures:
+                    pending.cancel()
     
-    def _send_phone_no_show_followup(self, patient: Patient, doctor: Doctor, 
-                                   appointment: Appointment) -> bool:
-        """Send no-show follow-up phone call"""
-        try:
-            message = f"We missed you at your appointment with Dr. {doctor.last_name}. Please call us to reschedule. We're here to help!"
-            
-            print(f"NO-SHOW FOLLOW-UP PHONE CALL to {patient.phone}")
-            print(f"Message: {message}")
-            
+    def _batch_failing(self, results: Dict, kind: str, batch_size: int) -> bool:
+        """Whether a phase should stop: at least 30 sends with over a third failed and more failures than successes
+        
+        Marks the results as aborted when it says so.
+        """
+        sent, failed = results[f'{kind}s_sent'], results[f'{kind}_failures']
+        if batch_size >= _ABORT_MIN_BATCH and failed > batch_size // 3 and failed > sent:
+            results['aborted'] = True
+            logger.error("Aborting %s batch after %s of %s sends failed", kind, failed, batch_size)
             return True
-        except Exception as e:
-            print(f"Error sending no-show follow-up phone call: {e}")
-            return False
+        return False
     
-    def _send_email_cancellation(self, patient: Patient, doctor: Doctor, 
-                               appointment: Appointment, reason: str) -> bool:
-        """Send appointment cancellation email"""
-        try:
-            subject = f"Appointment Cancelled - {doctor.first_name} {doctor.last_name}"
-            body = f"""
-Dear {patient.first_name},
-
-Your appointment with Dr. {doctor.last_name} on {appointment.appointment_datetime.strftime('%B %d, %Y at %I:%M %p')} has been cancelled.
-
-{f'Reason: {reason}' if reason else ''}
-
-Please call us to reschedule at your convenience.
-
-Best regards,
-{self.db.get_clinic_settings().clinic_name if self.db.get_clinic_settings() else 'Medical Clinic'}
-            """.strip()
-            
-            print(f"CANCELLATION EMAIL SENT to {patient.email}")
-            print(f"Subject: {subject}")
-            
-            return True
-        except Exception as e:
-            print(f"Error sending cancellation email: {e}")
-            return False
+    def _record_send_outcome(self, results: Dict, kind: str, appointment_id: str,
+                             outcome: Any) -> None:
+        """Tally one send result (True/False or the exception it raised) into the batch results"""
+        if isinstance(outcome, BaseException):
+            results[f'{kind}_failures'] += 1
+            logger.error("Error sending %s for appointment %s: %s", kind, appointment_id, outcome)
+        elif outcome:
+            results[f'{kind}s_sent'] += 1
+        else:
+            results[f'{kind}_failures'] += 1
     
-    def _send_sms_cancellation(self, patient: Patient, doctor: Doctor, 
-                             appointment: Appointment, reason: str) -> bool:
-        """Send appointment cancellation SMS"""
+    def _notify(self, channel: str, template_key: str, patient: Patient, doctor: Doctor,
+                appointment: Appointment, **extra_fields: str) -> bool:
+        """Render and send one notification on the patient's channel (unknown channels get a phone call)"""
+        channels = _NOTIFICATIONS[template_key]
+        if channel not in channels:
+            channel = 'phone'
+        spec = channels[channel]
         try:
-            message = f"Your appointment with Dr. {doctor.last_name} has been cancelled. Please call us to reschedule."
+            recipient = _CHANNEL_TARGETS[channel](patient)
+            fields = self._message_fields(patient, doctor, appointment)
+            fields.update(extra_fields)
             
-            print(f"CANCELLATION SMS SENT to {patient.phone}")
-            print(f"Message: {message}")
+            if channel == 'email':
+                subject = spec['subject'].substitute(fields)
+                log_body = spec['log_body'] and logger.isEnabledFor(logging.INFO)
+                # Skip rendering a body that will be neither sent nor logged
+                body = spec['body'].substitute(fields) if self._sends_email or log_body else ""
+                
+                self._deliver_email(recipient, subject, body)
+                logger.info("%s to %s", spec['log'], recipient)
+                logger.info("Subject: %s", subject)
+                if spec['log_body']:
+                    logger.info("Body: %s...", body[:200])
+            else:
+                # SMS and phone calls are simulated for demo
+                logger.info("%s to %s", spec['log'], recipient)
+                logger.info("Message: %s", spec['message'].substitute(fields))
             
             return True
         except Exception as e:
-            print(f"Error sending cancellation SMS: {e}")
+            logger.error("Error sending %s: %s", spec['error'], e)
             return False
+        finally:
+            # A one-off send outside any batch writes its log lines out now
+            if self._pending_updates is None:
+                _flush_logs()
     
-    def _send_phone_cancellation(self, patient: Patient, doctor: Doctor, 
-                               appointment: Appointment, reason: str) -> bool:
-        """Send appointment cancellation phone call"""
-        try:
-            message = f"Your appointment with Dr. {doctor.last_name} has been cancelled. Please call us to reschedule."
-            
-            print(f"CANCELLATION PHONE CALL to {patient.phone}")
-            print(f"Message: {message}")
-            
-            return True
-        except Exception as e:
-            print(f"Error sending cancellation phone call: {e}")
-            return False
+    def _message_fields(self, patient: Patient, doctor: Doctor, appointment: Appointment) -> Dict:
+        """Substitution values shared by the message templates"""
+        return {
+            'first_name': patient.first_name,
+            'doctor_first_name': doctor.first_name,
+            'doctor_last_name': doctor.last_name,
+            'specialty': doctor.specialty,
+            'appointment_time': appointment.formatted_time,
+            'duration': appointment.duration,
+            'appointment_type': appointment.appointment_type,
+            'clinic_name': self._clinic_name()
+        }
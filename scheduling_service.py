@@ -2,7 +2,9 @@
 Appointment Scheduling Service for the Medical Appointment Scheduling AI Agent
 """
 import uuid
-from datetime import datetime, timedelta, time
+from bisect import bisect_left
+from collections import OrderedDict
+from datetime import datetime, time
 from typing import List, Optional, Dict, Tuple
 try:
     from .models import Patient, Doctor, Appointment, AppointmentStatus, PatientStatus
@@ -11,12 +13,50 @@ except ImportError:
     from models import Patient, Doctor, Appointment, AppointmentStatus, PatientStatus
     from database import MedicalDatabase
 
+# Most (doctor, day, duration) slot lists kept by get_available_slots
+_SLOT_CACHE_SIZE = 256
+
+# Working-hours keys by date.weekday()
+_DAY_NAMES = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+
+# Statuses that hold a slot
+_ACTIVE_STATUSES = frozenset({AppointmentStatus.SCHEDULED, AppointmentStatus.CONFIRMED})
+
+
+def _busy_intervals(appointments: List[Appointment], midnight: datetime) -> Tuple[List[float], List[float]]:
+    """Active appointments of a time-ordered day list as (starts, running max of ends),
+    both in seconds past midnight"""
+    starts, max_ends = [], []
+    latest_end = float('-inf')
+    for appointment in appointments:
+        if appointment.status in _ACTIVE_STATUSES:
+            start = (appointment.appointment_datetime - midnight).total_seconds()
+            latest_end = max(latest_end, start + appointment.duration * 60)
+            starts.append(start)
+            max_ends.append(latest_end)
+    return starts, max_ends
+
+
+def _slot_conflicts(starts: List[float], max_ends: List[float], slot_start: float, slot_end: float) -> bool:
+    """Whether any busy interval overlaps [slot_start, slot_end), each appointment using its own duration"""
+    # Only appointments starting before the slot ends can overlap it; of those,
+    # the one ending latest decides
+    i = bisect_left(starts, slot_end)
+    return i > 0 and max_ends[i - 1] > slot_start
+
 
 class SchedulingService:
     """Core appointment scheduling service"""
     
     def __init__(self, database: MedicalDatabase):
         self.db = database
+        # LRU of computed slot lists keyed by (doctor_id, day ordinal, duration) plus
+        # the appointments and doctors file stamps, so a write from any instance or
+        # process moves to fresh keys
+        self._slot_cache: OrderedDict = OrderedDict()
+        # Slot grids keyed by (start minute, end minute, duration); they depend only
+        # on the working-hours shape, so doctors with the same hours share them
+        self._slot_templates: Dict[Tuple[int, int, int], Tuple[Tuple[int, time], ...]] = {}
     
     def register_patient(self, first_name: str, last_name: str, date_of_birth: datetime,
                         phone: str, email: str, address: str, emergency_contact: str,
@@ -47,80 +87,91 @@ class SchedulingService:
     def find_patient(self, phone: str = None, email: str = None, 
                     first_name: str = None, last_name: str = None) -> List[Patient]:
         """Find patients by various criteria"""
-        patients = self.db.get_patients()
-        results = []
-        
-        for patient in patients:
-            match = True
-            
-            if phone and patient.phone != phone:
-                match = False
-            if email and patient.email != email:
-                match = False
-            if first_name and patient.first_name.lower() != first_name.lower():
-                match = False
-            if last_name and patient.last_name.lower() != last_name.lower():
-                match = False
-            
-            if match:
-                results.append(patient)
-        
-        return results
+        return self.db.find_patients(phone=phone, email=email,
+                                     first_name=first_name, last_name=last_name)
     
     def get_available_slots(self, doctor_id: str, date: datetime, 
                           appointment_duration: int = 30) -> List[datetime]:
         """Get available appointment slots for a doctor on a specific date"""
+        day = date.date() if hasattr(date, 'date') else date
+        key = (doctor_id, day.toordinal(), appointment_duration,
+               self.db.appointments_stamp(), self.db.doctors_stamp())
+        slots = self._slot_cache.get(key)
+        if slots is not None:
+            self._slot_cache.move_to_end(key)
+            return list(slots)
+        
+        slots = tuple(self._compute_available_slots(doctor_id, date, appointment_duration))
+        self._slot_cache[key] = slots
+        if len(self._slot_cache) > _SLOT_CACHE_SIZE:
+            self._slot_cache.popitem(last=False)
+        return list(slots)
+    
+    def _compute_available_slots(self, doctor_id: str, date: datetime,
+                                 appointment_duration: int) -> List[datetime]:
+        """Free slots for a doctor on a day, computed from the database"""
         doctor = self.db.get_doctor(doctor_id)
         if not doctor:
             return []
         
-        # Get doctor's working hours for the day
-        day_name = date.strftime('%A').lower()
-        if day_name not in doctor.working_hours:
+        # Get doctor's working hours for the day, in minutes past midnight
+        working_minutes = doctor.working_hours_minutes.get(_DAY_NAMES[date.weekday()])
+        if working_minutes is None:
             return []
+        start_minute, end_minute = working_minutes
         
-        working_hours = doctor.working_hours[day_name]
-        start_time = datetime.strptime(working_hours['start'], '%H:%M').time()
-        end_time = datetime.strptime(working_hours['end'], '%H:%M').time()
-        
-        # Get existing appointments for the day
-        if hasattr(date, 'date'):
-            date_obj = date.date()
-        else:
-            date_obj = date
-        start_of_day = datetime.combine(date_obj, start_time)
-        end_of_day = datetime.combine(date_obj, end_time)
-        existing_appointments = self.db.get_appointments(
-            doctor_id=doctor_id,
-            start_date=start_of_day,
-            end_date=end_of_day
-        )
+        # Get existing appointments for the day, already sorted by time
+        date_obj = date.date() if hasattr(date, 'date') else date
+        midnight = datetime.combine(date_obj, time.min)
+        existing_appointments = self.db.get_doctor_day_appointments(doctor_id, date_obj)
         
-        # Create list of occupied time slots
-        occupied_slots = []
-        for appointment in existing_appointments:
-            if appointment.status in [AppointmentStatus.SCHEDULED, AppointmentStatus.CONFIRMED]:
-                occupied_slots.append(appointment.appointment_datetime)
+        busy_starts, busy_ends = _busy_intervals(existing_appointments, midnight)
         
-        # Generate available slots
+        # Walk the precomputed slot grid, building datetimes only for free slots
         available_slots = []
-        current_time = start_of_day
-        
-        while current_time + timedelta(minutes=appointment_duration) <= end_of_day:
-            # Check if this slot conflicts with existing appointments
-            slot_conflict = False
-            for occupied_slot in occupied_slots:
-                if abs((current_time - occupied_slot).total_seconds()) < appointment_duration * 60:
-                    slot_conflict = True
-                    break
-            
-            if not slot_conflict:
-                available_slots.append(current_time)
-            
-            current_time += timedelta(minutes=appointment_duration)
+        step = appointment_duration * 60
+        for offset, slot_time in self._slot_template(start_minute, end_minute, appointment_duration):
+            if not _slot_conflicts(busy_starts, busy_ends, offset, offset + step):
+                available_slots.append(datetime.combine(date_obj, slot_time))
         
         return available_slots
     
+    def _slot_template(self, start_minute: int, end_minute: int,
+                       duration: int) -> Tuple[Tuple[int, time], ...]:
+        """Slot starts for a working-hours window as (seconds past midnight, time) pairs"""
+        key = (start_minute, end_minute, duration)
+        template = self._slot_templates.get(key)
+        if template is None:
+            template = tuple(
+                (minute * 60, time(minute // 60, minute % 60))
+                for minute in range(start_minute, end_minute - duration + 1, duration)
+            )
+            self._slot_templates[key] = template
+        return template
+    
+    def _is_slot_free(self, doctor_id: str, dt: datetime, duration: int) -> bool:
+        """Check a single slot: on the doctor's slot grid for that day and clear of active appointments"""
+        doctor = self.db.get_doctor(doctor_id)
+        if not doctor:
+            return False
+        
+        working_minutes = doctor.working_hours_minutes.get(_DAY_NAMES[dt.weekday()])
+        if working_minutes is None:
+            return False
+        
+        # Slots start at the beginning of the working day and repeat every `duration` minutes
+        start_minute, end_minute = working_minutes
+        minute = dt.hour * 60 + dt.minute
+        if (dt.second or dt.microsecond or minute < start_minute or
+                minute + duration > end_minute or (minute - start_minute) % duration):
+            return False
+        
+        # Same conflict rule as the slot listing
+        day_appointments = self.db.get_doctor_day_appointments(doctor_id, dt.date())
+        busy_starts, busy_ends = _busy_intervals(day_appointments, datetime.combine(dt.date(), time.min))
+        offset = minute * 60
+        return not _slot_conflicts(busy_starts, busy_ends, offset, offset + duration * 60)
+    
     def book_appointment(self, patient_id: str, doctor_id: str, 
                         appointment_datetime: datetime, appointment_type: str = "general",
                         notes: str = "") -> str:
@@ -136,8 +187,7 @@ class SchedulingService:
             raise ValueError("Doctor not found")
         
         # Check if slot is available
-        available_slots = self.get_available_slots(doctor_id, appointment_datetime, doctor.appointment_duration)
-        if appointment_datetime not in available_slots:
+        if not self._is_slot_free(doctor_id, appointment_datetime, doctor.appointment_duration):
             raise ValueError("Appointment slot not available")
         
         # Create appointment
@@ -164,10 +214,7 @@ class SchedulingService:
             return False
         
         # Check if new slot is available
-        available_slots = self.get_available_slots(
-            appointment.doctor_id, new_datetime, appointment.duration
-        )
-        if new_datetime not in available_slots:
+        if not self._is_slot_free(appointment.doctor_id, new_datetime, appointment.duration):
             return False
         
         # Update appointment
@@ -227,68 +274,42 @@ class SchedulingService:
         return self.db.update_appointment(appointment)
     
     def get_patient_appointments(self, patient_id: str, 
-                               upcoming_only: bool = True) -> List[Appointment]:
-        """Get appointments for a specific patient"""
-        appointments = self.db.get_appointments(patient_id=patient_id)
-        
+                               upcoming_only: bool = True,
+                               now: Optional[datetime] = None) -> List[Appointment]:
+        """Get appointments for a specific patient, upcoming as of `now` (default: the current time)"""
+        after = None
         if upcoming_only:
-            now = datetime.now()
-            appointments = [a for a in appointments if a.appointment_datetime > now]
+            after = now if now is not None else datetime.now()
         
-        return sorted(appointments, key=lambda x: x.appointment_datetime)
+        # The per-patient index is already in time order, so upcoming is one bisect
+        return self.db.get_patient_appointments_sorted(patient_id, after=after)
     
     def get_doctor_schedule(self, doctor_id: str, date: datetime) -> List[Appointment]:
         """Get doctor's schedule for a specific date"""
-        start_of_day = datetime.combine(date.date(), time.min)
-        end_of_day = datetime.combine(date.date(), time.max)
-        
-        appointments = self.db.get_appointments(
-            doctor_id=doctor_id,
-            start_date=start_of_day,
-            end_date=end_of_day
-        )
-        
-        return sorted(appointments, key=lambda x: x.appointment_datetime)
+        return self.db.get_doctor_day_appointments(doctor_id, date.date())
     
-    def get_appointments_needing_reminders(self, hours_before: int = 24) -> List[Appointment]:
+    def get_appointments_needing_reminders(self, hours_before: int = 24,
+                                          now: Optional[datetime] = None) -> List[Appointment]:
         """Get appointments that need reminders"""
-        cutoff_time = datetime.now() + timedelta(hours=hours_before)
-        appointments = self.db.get_appointments()
-        
-        needing_reminders = []
-        for appointment in appointments:
-            if (appointment.status in [AppointmentStatus.SCHEDULED, AppointmentStatus.CONFIRMED] and
-                appointment.appointment_datetime <= cutoff_time and
-                not appointment.reminder_sent):
-                needing_reminders.append(appointment)
-        
-        return needing_reminders
+        # The database filters its status index on the raw records
+        return self.db.get_appointments_needing_reminders(hours_before, now=now)
     
-    def get_appointments_needing_confirmation(self, hours_before: int = 2) -> List[Appointment]:
+    def get_appointments_needing_confirmation(self, hours_before: int = 2,
+                                              now: Optional[datetime] = None) -> List[Appointment]:
         """Get appointments that need confirmation"""
-        cutoff_time = datetime.now() + timedelta(hours=hours_before)
-        appointments = self.db.get_appointments()
-        
-        needing_confirmation = []
-        for appointment in appointments:
-            if (appointment.status == AppointmentStatus.SCHEDULED and
-                appointment.appointment_datetime <= cutoff_time and
-                not appointment.confirmation_sent):
-                needing_confirmation.append(appointment)
-        
-        return needing_confirmation
+        return self.db.get_appointments_needing_confirmation(hours_before, now=now)
     
     def get_high_risk_patients(self) -> List[Patient]:
         """Get patients with high no-show risk"""
-        patients = self.db.get_patients()
-        return [p for p in patients if p.status == PatientStatus.HIGH_RISK]
+        return self.db.get_high_risk_patients()
     
     def get_appointment_statistics(self, start_date: datetime, end_date: datetime) -> Dict:
         """Get appointment statistics for a date range"""
-        appointments = self.db.get_appointments(start_date=start_date, end_date=end_date)
+        # One bincount over the packed status codes of the date window
+        counts = self.db.count_appointments_by_status(start_date=start_date, end_date=end_date)
         
         stats = {
-            'total_appointments': len(appointments),
+            'total_appointments': sum(counts.values()),
             'scheduled': 0,
             'confirmed': 0,
             'completed': 0,
@@ -297,13 +318,13 @@ class SchedulingService:
             'rescheduled': 0
         }
         
-        for appointment in appointments:
-            status = appointment.status.value
-            if status in stats:
-                stats[status] += 1
+        for status, count in counts.items():
+            if status.label in stats:
+                stats[status.label] = count
         
         # Calculate no-show rate
-        total_attempted = stats['completed'] + stats['no_shows'] + stats['cancelled']
-        stats['no_show_rate'] = (stats['no_shows'] / total_attempted * 100) if total_attempted > 0 else 0
+        no_shows = stats['no_shows']
+        total_attempted = stats['completed'] + no_shows + stats['cancelled']
+        stats['no_show_rate'] = (no_shows / total_attempted * 100) if total_attempted > 0 else 0
         
         return stats
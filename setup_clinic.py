@@ -8,6 +8,67 @@ from database import MedicalDatabase
 from models import Doctor, ClinicSettings
 from config import get_config
 
+# Sample doctors added by setup_clinic, built once at import
+_DEFAULT_DOCTORS = (
+    Doctor(
+        id="doc_001",
+        first_name="Sarah",
+        last_name="Johnson",
+        specialty="Internal Medicine",
+        phone="(555) 123-4567",
+        email="sarah.johnson@medassist.com",
+        working_hours={
+            "monday": {"start": "09:00", "end": "17:00"},
+            "tuesday": {"start": "09:00", "end": "17:00"},
+            "wednesday": {"start": "09:00", "end": "17:00"},
+            "thursday": {"start": "09:00", "end": "17:00"},
+            "friday": {"start": "09:00", "end": "15:00"},
+            "saturday": {"start": "10:00", "end": "14:00"},
+            "sunday": {"start": "10:00", "end": "12:00"}
+        },
+        appointment_duration=30,
+        max_patients_per_day=20
+    ),
+    Doctor(
+        id="doc_002",
+        first_name="Michael",
+        last_name="Chen",
+        specialty="Cardiology",
+        phone="(555) 123-4568",
+        email="michael.chen@medassist.com",
+        working_hours={
+            "monday": {"start": "08:00", "end": "16:00"},
+            "tuesday": {"start": "08:00", "end": "16:00"},
+            "wednesday": {"start": "08:00", "end": "16:00"},
+            "thursday": {"start": "08:00", "end": "16:00"},
+            "friday": {"start": "08:00", "end": "14:00"},
+            "saturday": {"start": "09:00", "end": "13:00"},
+            "sunday": {"start": "09:00", "end": "11:00"}
+        },
+        appointment_duration=45,
+        max_patients_per_day=15
+    ),
+    Doctor(
+        id="doc_003",
+        first_name="Emily",
+        last_name="Rodriguez",
+        specialty="Pediatrics",
+        phone="(555) 123-4569",
+        email="emily.rodriguez@medassist.com",
+        working_hours={
+            "monday": {"start": "09:00", "end": "17:00"},
+            "tuesday": {"start": "09:00", "end": "17:00"},
+            "wednesday": {"start": "09:00", "end": "17:00"},
+            "thursday": {"start": "09:00", "end": "17:00"},
+            "friday": {"start": "09:00", "end": "16:00"},
+            "saturday": {"start": "10:00", "end": "15:00"},
+            "sunday": {"start": "10:00", "end": "12:00"}
+        },
+        appointment_duration=30,
+        max_patients_per_day=25
+    )
+)
+
 
 def setup_clinic():
     """Initialize the clinic with default settings and sample data"""
@@ -24,76 +85,20 @@ def setup_clinic():
     print(f"✅ Clinic settings configured: {clinic_settings.clinic_name}")
     
     # Add sample doctors
-    sample_doctors = [
-        Doctor(
-            id="doc_001",
-            first_name="Sarah",
-            last_name="Johnson",
-            specialty="Internal Medicine",
-            phone="(555) 123-4567",
-            email="sarah.johnson@medassist.com",
-            working_hours={
-                "monday": {"start": "09:00", "end": "17:00"},
-                "tuesday": {"start": "09:00", "end": "17:00"},
-                "wednesday": {"start": "09:00", "end": "17:00"},
-                "thursday": {"start": "09:00", "end": "17:00"},
-                "friday": {"start": "09:00", "end": "15:00"},
-                "saturday": {"start": "10:00", "end": "14:00"},
-                "sunday": {"start": "10:00", "end": "12:00"}
-            },
-            appointment_duration=30,
-            max_patients_per_day=20
-        ),
-        Doctor(
-            id="doc_002",
-            first_name="Michael",
-            last_name="Chen",
-            specialty="Cardiology",
-            phone="(555) 123-4568",
-            email="michael.chen@medassist.com",
-            working_hours={
-                "monday": {"start": "08:00", "end": "16:00"},
-                "tuesday": {"start": "08:00", "end": "16:00"},
-                "wednesday": {"start": "08:00", "end": "16:00"},
-                "thursday": {"start": "08:00", "end": "16:00"},
-                "friday": {"start": "08:00", "end": "14:00"},
-                "saturday": {"start": "09:00", "end": "13:00"},
-                "sunday": {"start": "09:00", "end": "11:00"}
-            },
-            appointment_duration=45,
-            max_patients_per_day=15
-        ),
-        Doctor(
-            id="doc_003",
-            first_name="Emily",
-            last_name="Rodriguez",
-            specialty="Pediatrics",
-            phone="(555) 123-4569",
-            email="emily.rodriguez@medassist.com",
-            working_hours={
-                "monday": {"start": "09:00", "end": "17:00"},
-                "tuesday": {"start": "09:00", "end": "17:00"},
-                "wednesday": {"start": "09:00", "end": "17:00"},
-                "thursday": {"start": "09:00", "end": "17:00"},
-                "friday": {"start": "09:00", "end": "16:00"},
-                "saturday": {"start": "10:00", "end": "15:00"},
-                "sunday": {"start": "10:00", "end": "12:00"}
-            },
-            appointment_duration=30,
-            max_patients_per_day=25
-        )
-    ]
-    
-    for doctor in sample_doctors:
-        if db.add_doctor(doctor):
+    for doctor, added in zip(_DEFAULT_DOCTORS, db.add_doctors_bulk(list(_DEFAULT_DOCTORS))):
+        if added:
             print(f"✅ Added doctor: Dr. {doctor.first_name} {doctor.last_name} ({doctor.specialty})")
         else:
             print(f"⚠️  Doctor already exists: Dr. {doctor.first_name} {doctor.last_name}")
     
     # Create necessary directories
     directories = ["data", "logs", "backups", "reports"]
+    # One scan of the working directory finds the ones already present
+    with os.scandir('.') as entries:
+        existing = {entry.name for entry in entries if entry.is_dir()}
     for directory in directories:
-        os.makedirs(directory, exist_ok=True)
+        if directory not in existing:
+            os.makedirs(directory, exist_ok=True)
         print(f"✅ Created directory: {directory}")
     
     # Validate configuration
@@ -125,19 +130,13 @@ def reset_clinic():
     response = input("Are you sure you want to reset? Type 'yes' to confirm: ")
     
     if response.lower() == 'yes':
-        # Remove data files
-        data_files = [
-            "data/patients.json",
-            "data/doctors.json", 
-            "data/appointments.json",
-            "data/no_show_predictions.json",
-            "data/clinic_settings.json"
-        ]
-        
-        for file_path in data_files:
-            if os.path.exists(file_path):
-                os.remove(file_path)
-                print(f"✅ Removed: {file_path}")
+        # Remove the JSON data files found by one scan of the data directory
+        if os.path.isdir("data"):
+            with os.scandir("data") as entries:
+                for entry in entries:
+                    if entry.name.endswith(".json") and entry.is_file():
+                        os.remove(entry.path)
+                        print(f"✅ Removed: {entry.path}")
         
         print("✅ Clinic data reset completed")
         return True
@@ -166,23 +165,23 @@ def show_clinic_status():
     # Statistics
     patients = db.get_patients()
     doctors = db.get_doctors()
-    appointments = db.get_appointments()
+    total_appointments = sum(db.count_appointments_by_status().values())
     
     print(f"\n📊 Statistics:")
     print(f"Total Patients: {len(patients)}")
     print(f"Total Doctors: {len(doctors)}")
-    print(f"Total Appointments: {len(appointments)}")
+    print(f"Total Appointments: {total_appointments}")
     
     # Recent appointments
-    if appointments:
-        recent_appointments = sorted(appointments, key=lambda x: x.appointment_datetime, reverse=True)[:5]
+    recent_appointments = db.get_recent_appointments(limit=5)
+    if recent_appointments:
         print(f"\n📅 Recent Appointments:")
         for appointment in recent_appointments:
             patient = db.get_patient(appointment.patient_id)
             doctor = db.get_doctor(appointment.doctor_id)
             patient_name = f"{patient.first_name} {patient.last_name}" if patient else "Unknown"
             doctor_name = f"Dr. {doctor.first_name} {doctor.last_name}" if doctor else "Unknown"
-            print(f"   - {appointment.appointment_datetime.strftime('%Y-%m-%d %H:%M')}: {patient_name} with {doctor_name} ({appointment.status.value})")
+            print(f"   - {appointment.appointment_datetime.strftime('%Y-%m-%d %H:%M')}: {patient_name} with {doctor_name} ({appointment.status.label})")
 
 
 if __name__ == "__main__":
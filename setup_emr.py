@@ -6,7 +6,39 @@ import os
 import sys
 from datetime import datetime
 from sqlite_database import SQLiteMedicalDatabase
-from emr_agent import emr_agent
+from emr_agent import emr_agent, db as emr_db
+
+# Sample doctors added by setup_emr_system, built once at import
+_DEFAULT_WORKING_HOURS = '{"monday": {"start": "09:00", "end": "17:00"}, "tuesday": {"start": "09:00", "end": "17:00"}, "wednesday": {"start": "09:00", "end": "17:00"}, "thursday": {"start": "09:00", "end": "17:00"}, "friday": {"start": "09:00", "end": "17:00"}}'
+_DEFAULT_DOCTORS = (
+    {
+        "id": "doc_001",
+        "first_name": "Dr. Rajesh",
+        "last_name": "Kumar",
+        "specialty": "General Medicine",
+        "phone": "+91-9876543210",
+        "email": "rajesh.kumar@clinic.com",
+        "working_hours": _DEFAULT_WORKING_HOURS
+    },
+    {
+        "id": "doc_002", 
+        "first_name": "Dr. Priya",
+        "last_name": "Sharma",
+        "specialty": "Cardiology",
+        "phone": "+91-9876543211",
+        "email": "priya.sharma@clinic.com",
+        "working_hours": _DEFAULT_WORKING_HOURS
+    },
+    {
+        "id": "doc_003",
+        "first_name": "Dr. Amit",
+        "last_name": "Patel",
+        "specialty": "Pediatrics",
+        "phone": "+91-9876543212",
+        "email": "amit.patel@clinic.com",
+        "working_hours": _DEFAULT_WORKING_HOURS
+    }
+)
 
 
 def setup_emr_system():
@@ -30,40 +62,8 @@ def setup_emr_system():
     
     # Add sample doctors
     print("👨‍⚕️ Adding sample doctors...")
-    doctors = [
-        {
-            "id": "doc_001",
-            "first_name": "Dr. Rajesh",
-            "last_name": "Kumar",
-            "specialty": "General Medicine",
-            "phone": "+91-9876543210",
-            "email": "rajesh.kumar@clinic.com"
-        },
-        {
-            "id": "doc_002", 
-            "first_name": "Dr. Priya",
-            "last_name": "Sharma",
-            "specialty": "Cardiology",
-            "phone": "+91-9876543211",
-            "email": "priya.sharma@clinic.com"
-        },
-        {
-            "id": "doc_003",
-            "first_name": "Dr. Amit",
-            "last_name": "Patel",
-            "specialty": "Pediatrics",
-            "phone": "+91-9876543212",
-            "email": "amit.patel@clinic.com"
-        }
-    ]
-    
-    working_hours = '{"monday": {"start": "09:00", "end": "17:00"}, "tuesday": {"start": "09:00", "end": "17:00"}, "wednesday": {"start": "09:00", "end": "17:00"}, "thursday": {"start": "09:00", "end": "17:00"}, "friday": {"start": "09:00", "end": "17:00"}}'
-    
-    for doctor in doctors:
-        db.add_doctor(
-            doctor["id"], doctor["first_name"], doctor["last_name"],
-            doctor["specialty"], doctor["phone"], doctor["email"], working_hours
-        )
+    db.add_doctors_bulk(list(_DEFAULT_DOCTORS))
+    for doctor in _DEFAULT_DOCTORS:
         print(f"✅ Added: {doctor['first_name']} {doctor['last_name']} ({doctor['specialty']})")
     
     # Set up clinic settings
@@ -79,8 +79,12 @@ def setup_emr_system():
     
     # Create necessary directories
     directories = ["logs", "backups", "reports"]
+    # One scan of the working directory finds the ones already present
+    with os.scandir('.') as entries:
+        existing = {entry.name for entry in entries if entry.is_dir()}
     for directory in directories:
-        os.makedirs(directory, exist_ok=True)
+        if directory not in existing:
+            os.makedirs(directory, exist_ok=True)
         print(f"✅ Created directory: {directory}")
     
     # Verify setup
@@ -170,24 +174,21 @@ def reset_emr_system():
     
     if response.lower() == 'yes':
         try:
-            # Remove database file
-            if os.path.exists("patients.db"):
-                os.remove("patients.db")
-                print("✅ Database file removed")
-            
-            # Remove other data files
-            data_files = [
-                "data/patients.json",
-                "data/doctors.json", 
-                "data/appointments.json",
-                "data/no_show_predictions.json",
-                "data/clinic_settings.json"
-            ]
+            # Close the agent's open connection first, then remove the database
+            # file along with its WAL and shared-memory files
+            emr_db.close()
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists("patients.db" + suffix):
+                    os.remove("patients.db" + suffix)
+                    print(f"✅ Removed: patients.db{suffix}")
             
-            for file_path in data_files:
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-                    print(f"✅ Removed: {file_path}")
+            # Remove the JSON data files found by one scan of the data directory
+            if os.path.isdir("data"):
+                with os.scandir("data") as entries:
+                    for entry in entries:
+                        if entry.name.endswith(".json") and entry.is_file():
+                            os.remove(entry.path)
+                            print(f"✅ Removed: {entry.path}")
             
             print("✅ EMR system reset completed")
             print("Run 'python setup_emr.py setup' to reinitialize")
@@ -11,7 +11,7 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from database import MedicalDatabase
 from scheduling_service import SchedulingService
 from no_show_predictor import NoShowPredictor
-from notification_service import NotificationService
+from notification_service import NotificationService, configure_logging
 from insurance_service import InsuranceService
 from analytics_service import AnalyticsService
 from models import Doctor, Patient, Appointment, ClinicSettings
@@ -22,6 +22,9 @@ def simple_demo():
     print("🏥 MedAssist AI - Simple Demo")
     print("=" * 40)
     
+    # One clock snapshot for the slot search, reminder sweep and dashboard window
+    now = datetime.now()
+    
     # Initialize services
     print("\n📋 Initializing services...")
     db = MedicalDatabase()
@@ -78,13 +81,11 @@ def simple_demo():
     
     # Find next available appointment slot
     print("\n📅 Finding available appointment slot...")
-    current_date = datetime.now()
     appointment_slot = None
     
     for days_ahead in range(1, 8):  # Check next 7 days
-        test_date = current_date + timedelta(days=days_ahead)
-        day_name = test_date.strftime('%A').lower()
-        if day_name in ['monday', 'tuesday', 'wednesday', 'thursday', 'friday']:
+        test_date = now + timedelta(days=days_ahead)
+        if test_date.weekday() < 5:  # Monday to Friday
             available_slots = scheduling_service.get_available_slots("demo_doc", test_date)
             if available_slots:
                 appointment_slot = available_slots[0]
@@ -125,17 +126,16 @@ def simple_demo():
     
     # Demonstrate notification system
     print("\n📱 Demonstrating notification system...")
-    results = notification_service.process_scheduled_reminders()
+    results = notification_service.process_scheduled_reminders(now=now)
     print(f"✅ Reminders sent: {results['reminders_sent']}")
     print(f"✅ Confirmations sent: {results['confirmations_sent']}")
     print(f"⚠️  High-risk appointments: {results['high_risk_appointments']}")
     
     # Demonstrate analytics
     print("\n📈 Demonstrating analytics...")
-    start_date = datetime.now() - timedelta(days=30)
-    end_date = datetime.now() + timedelta(days=30)
-    
-    dashboard_data = analytics_service.generate_clinic_dashboard(start_date, end_date)
+    dashboard_data = analytics_service.generate_clinic_dashboard(
+        now - timedelta(days=30), now + timedelta(days=30)
+    )
     
     appointment_stats = dashboard_data['appointment_statistics']
     print(f"📊 Total appointments: {appointment_stats['total_appointments']}")
@@ -147,25 +147,27 @@ def simple_demo():
     print(f"💰 Potential revenue: ${revenue_analytics['potential_revenue']:.2f}")
     print(f"💰 Revenue efficiency: {revenue_analytics['revenue_efficiency']:.1f}%")
     
-    # Summary
-    print("\n🎉 Simple demo completed successfully!")
-    print("\n📋 MedAssist AI capabilities demonstrated:")
-    print("✅ Patient registration and management")
-    print("✅ Doctor scheduling and availability")
-    print("✅ Appointment booking and management")
-    print("✅ No-show prediction and risk assessment")
-    print("✅ Insurance verification and coverage")
-    print("✅ Automated notifications and reminders")
-    print("✅ Comprehensive analytics and reporting")
-    
-    print(f"\n💡 This demo shows how MedAssist AI can help medical practices:")
-    print("   - Reduce no-shows through predictive intervention")
-    print("   - Improve revenue through better insurance collection")
-    print("   - Streamline operations with automated workflows")
-    print("   - Gain insights through comprehensive analytics")
+    # Summary, written in one print
+    print("\n".join([
+        "\n🎉 Simple demo completed successfully!",
+        "\n📋 MedAssist AI capabilities demonstrated:",
+        "✅ Patient registration and management",
+        "✅ Doctor scheduling and availability",
+        "✅ Appointment booking and management",
+        "✅ No-show prediction and risk assessment",
+        "✅ Insurance verification and coverage",
+        "✅ Automated notifications and reminders",
+        "✅ Comprehensive analytics and reporting",
+        "\n💡 This demo shows how MedAssist AI can help medical practices:",
+        "   - Reduce no-shows through predictive intervention",
+        "   - Improve revenue through better insurance collection",
+        "   - Streamline operations with automated workflows",
+        "   - Gain insights through comprehensive analytics",
+    ]))
     
     return True
 
 
 if __name__ == "__main__":
+    configure_logging()
     simple_demo()
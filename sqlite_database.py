@@ -4,194 +4,273 @@ Replaces the JSON-based database with SQLite for better performance and reliabil
 """
 import sqlite3
 import random
+import threading
+import time
 from datetime import datetime, timedelta, date
 from typing import List, Dict, Optional, Any
 import os
 
+# Patient columns as returned to callers; SQLite tags new vs returning patients during the scan
+_PATIENT_COLUMNS = """patient_id, name, last_visit_date, visits_count,
+                   CASE WHEN visits_count = 1 THEN 'new' ELSE 'returning' END AS patient_type"""
+
+# Tables and indexes, created in one executescript call. The (patient|doctor,
+# datetime) indexes return a filtered range already in time order, so ORDER BY
+# needs no sort; they cover the single-column indexes they replaced.
+_SCHEMA_SQL = """
+-- Patients table as specified in requirements
+CREATE TABLE IF NOT EXISTS patients (
+    patient_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    last_visit_date DATE,
+    visits_count INTEGER DEFAULT 1
+);
+
+-- Appointments table for scheduling functionality
+CREATE TABLE IF NOT EXISTS appointments (
+    appointment_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    patient_id INTEGER,
+    doctor_id TEXT,
+    appointment_datetime DATETIME,
+    status TEXT DEFAULT 'scheduled',
+    appointment_type TEXT DEFAULT 'general',
+    notes TEXT,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (patient_id) REFERENCES patients (patient_id)
+);
+
+CREATE TABLE IF NOT EXISTS doctors (
+    doctor_id TEXT PRIMARY KEY,
+    first_name TEXT NOT NULL,
+    last_name TEXT NOT NULL,
+    specialty TEXT,
+    phone TEXT,
+    email TEXT,
+    working_hours TEXT,
+    is_active BOOLEAN DEFAULT 1
+);
+
+CREATE TABLE IF NOT EXISTS clinic_settings (
+    id INTEGER PRIMARY KEY,
+    clinic_name TEXT,
+    address TEXT,
+    phone TEXT,
+    email TEXT,
+    timezone TEXT DEFAULT 'Asia/Kolkata'
+);
+
+-- Appointment filters and join, datetime ordering and case-insensitive name lookups
+DROP INDEX IF EXISTS idx_appt_patient;
+DROP INDEX IF EXISTS idx_appt_doctor;
+CREATE INDEX IF NOT EXISTS idx_appt_patient_dt ON appointments(patient_id, appointment_datetime);
+CREATE INDEX IF NOT EXISTS idx_appt_doctor_dt ON appointments(doctor_id, appointment_datetime);
+CREATE INDEX IF NOT EXISTS idx_appt_dt ON appointments(appointment_datetime);
+CREATE INDEX IF NOT EXISTS idx_patients_name ON patients(name COLLATE NOCASE);
+
+-- Partial index holding only active doctors, so inactive rows drop out of get_doctors
+CREATE INDEX IF NOT EXISTS idx_doctors_active ON doctors(doctor_id) WHERE is_active = 1;
+"""
+
+# Seconds a cached read-mostly result (settings, doctors, patient statistics) is served;
+# writes from other instances or processes can go unseen for up to this long
+_CACHE_TTL = 30.0
+
+# Shared by the single and bulk patient inserts
+_INSERT_PATIENT_SQL = "INSERT INTO patients (name, last_visit_date, visits_count) VALUES (?, ?, ?)"
+
+# Indian names for realistic synthetic patients
+_FIRST_NAMES = (
+    "Aarav", "Aditya", "Akshay", "Aman", "Ankit", "Arjun", "Bharat", "Chirag", "Deepak", "Gaurav",
+    "Harsh", "Ishaan", "Jatin", "Karan", "Laksh", "Manish", "Nikhil", "Omkar", "Pranav", "Rahul",
+    "Rajesh", "Sahil", "Tarun", "Uday", "Vikram", "Yash", "Zubin",
+    "Aanya", "Bhavya", "Chitra", "Deepika", "Esha", "Fatima", "Gayatri", "Hema", "Isha", "Jaya",
+    "Kavya", "Lakshmi", "Meera", "Neha", "Priya", "Radha", "Sakshi", "Tara", "Uma", "Vidya", "Yamini"
+)
+
+_LAST_NAMES = (
+    "Sharma", "Verma", "Gupta", "Singh", "Kumar", "Patel", "Agarwal", "Jain", "Malhotra", "Reddy",
+    "Nair", "Iyer", "Menon", "Pillai", "Rao", "Choudhary", "Mishra", "Tiwari", "Yadav", "Pandey",
+    "Joshi", "Bhatt", "Mehta", "Gandhi", "Kapoor", "Khanna", "Saxena", "Agarwal", "Bansal", "Goel"
+)
+
 
 class SQLiteMedicalDatabase:
     """SQLite-based database for the medical appointment system"""
     
     def __init__(self, db_path: str = "patients.db"):
         self.db_path = db_path
+        # One long-lived connection per thread, so SQLite's schema, page and
+        # statement caches survive between calls
+        self._local = threading.local()
+        # Every thread's connection, so close() can release them all
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        # Cached read-mostly results are shared by every thread, so a write from
+        # any thread invalidates them for all
+        self._cache: Dict[str, tuple] = {}
+        self._cache_lock = threading.Lock()
         self.init_database()
     
+    def _connect(self) -> sqlite3.Connection:
+        """This thread's connection, opened with the performance pragmas on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Used only by this thread, but close() may run on another
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            # Rows map column names to values in C, so reads need no per-row dict building
+            conn.row_factory = sqlite3.Row
+            # WAL (set once in init_database) only needs NORMAL sync for durable commits
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA temp_store=MEMORY")
+            conn.execute("PRAGMA cache_size=-20000")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+    
+    def close(self):
+        """Close every thread's connection; each thread's next call opens a fresh one"""
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        # Fresh local state, so no thread reuses a closed connection
+        self._local = threading.local()
+        with self._cache_lock:
+            self._cache.clear()
+    
+    def _cache_get(self, key: str) -> Optional[tuple]:
+        """A fresh cached result as a 1-tuple, or None on a miss
+        
+        Entries are shared across threads and expire after _CACHE_TTL seconds; a hit runs no query.
+        """
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if time.monotonic() >= expires_at:
+                del self._cache[key]
+                return None
+        return (value,)
+    
+    def _cache_put(self, key: str, value: Any):
+        """Cache a result for every thread using this database"""
+        with self._cache_lock:
+            self._cache[key] = (value, time.monotonic() + _CACHE_TTL)
+    
+    def _invalidate(self, key: str):
+        """Drop a cached result after a write through this instance
+        
+        The cache is shared, so every thread sees the write on its next read.
+        """
+        with self._cache_lock:
+            self._cache.pop(key, None)
+    
     def init_database(self):
         """Initialize the database with required tables"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        conn = self._connect()
         
-        # Create patients table as specified in requirements
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS patients (
-                patient_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                last_visit_date DATE,
-                visits_count INTEGER DEFAULT 1
-            )
-        ''')
-        
-        # Create appointments table for scheduling functionality
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS appointments (
-                appointment_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                patient_id INTEGER,
-                doctor_id TEXT,
-                appointment_datetime DATETIME,
-                status TEXT DEFAULT 'scheduled',
-                appointment_type TEXT DEFAULT 'general',
-                notes TEXT,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (patient_id) REFERENCES patients (patient_id)
-            )
-        ''')
-        
-        # Create doctors table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS doctors (
-                doctor_id TEXT PRIMARY KEY,
-                first_name TEXT NOT NULL,
-                last_name TEXT NOT NULL,
-                specialty TEXT,
-                phone TEXT,
-                email TEXT,
-                working_hours TEXT,
-                is_active BOOLEAN DEFAULT 1
-            )
-        ''')
-        
-        # Create clinic_settings table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS clinic_settings (
-                id INTEGER PRIMARY KEY,
-                clinic_name TEXT,
-                address TEXT,
-                phone TEXT,
-                email TEXT,
-                timezone TEXT DEFAULT 'Asia/Kolkata'
-            )
-        ''')
+        # Write-ahead logging lets readers run alongside a writer; the mode is
+        # stored in the database file, so it only has to be set once
+        conn.execute("PRAGMA journal_mode=WAL")
         
-        conn.commit()
-        conn.close()
+        # Create all tables and indexes; executescript commits as it goes
+        conn.executescript(_SCHEMA_SQL)
     
     def generate_synthetic_patients(self, count: int = 50):
         """Generate 50 synthetic patient records as specified"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
-        # Indian names for realistic data
-        first_names = [
-            "Aarav", "Aditya", "Akshay", "Aman", "Ankit", "Arjun", "Bharat", "Chirag", "Deepak", "Gaurav",
-            "Harsh", "Ishaan", "Jatin", "Karan", "Laksh", "Manish", "Nikhil", "Omkar", "Pranav", "Rahul",
-            "Rajesh", "Sahil", "Tarun", "Uday", "Vikram", "Yash", "Zubin",
-            "Aanya", "Bhavya", "Chitra", "Deepika", "Esha", "Fatima", "Gayatri", "Hema", "Isha", "Jaya",
-            "Kavya", "Lakshmi", "Meera", "Neha", "Priya", "Radha", "Sakshi", "Tara", "Uma", "Vidya", "Yamini"
-        ]
-        
-        last_names = [
-            "Sharma", "Verma", "Gupta", "Singh", "Kumar", "Patel", "Agarwal", "Jain", "Malhotra", "Reddy",
-            "Nair", "Iyer", "Menon", "Pillai", "Rao", "Choudhary", "Mishra", "Tiwari", "Yadav", "Pandey",
-            "Joshi", "Bhatt", "Mehta", "Gandhi", "Kapoor", "Khanna", "Saxena", "Agarwal", "Bansal", "Goel"
+        # Generate synthetic patients: name, a last visit within the past 2 years
+        # (730 days) and between 1 and 5 visits, each column drawn in one call.
+        # Drawing by column means a given random seed no longer yields the rows
+        # the old per-row draws did. Dates are bound as ISO strings so no per-row
+        # adapter call is needed.
+        today = date.today()
+        rows = [
+            (f"{first_name} {last_name}", (today - timedelta(days=days_ago)).isoformat(), visits_count)
+            for first_name, last_name, days_ago, visits_count in zip(
+                random.choices(_FIRST_NAMES, k=count),
+                random.choices(_LAST_NAMES, k=count),
+                random.choices(range(1, 731), k=count),
+                random.choices(range(1, 6), k=count)
+            )
         ]
         
-        # Clear existing patients
-        cursor.execute("DELETE FROM patients")
+        # Clear existing patients and insert the batch in one transaction; the
+        # connection context commits it, or rolls it back if an insert fails
+        with conn:
+            cursor.execute("BEGIN")
+            cursor.execute("DELETE FROM patients")
+            cursor.executemany(_INSERT_PATIENT_SQL, rows)
         
-        # Generate synthetic patients
-        for i in range(count):
-            first_name = random.choice(first_names)
-            last_name = random.choice(last_names)
-            name = f"{first_name} {last_name}"
-            
-            # Random last visit date within past 2 years
-            days_ago = random.randint(1, 730)  # 2 years = 730 days
-            last_visit = date.today() - timedelta(days=days_ago)
-            
-            # Random visits count between 1 and 5
-            visits_count = random.randint(1, 5)
-            
-            cursor.execute('''
-                INSERT INTO patients (name, last_visit_date, visits_count)
-                VALUES (?, ?, ?)
-            ''', (name, last_visit, visits_count))
-        
-        conn.commit()
-        conn.close()
+        self._invalidate('patient_statistics')
         print(f"✅ Generated {count} synthetic patient records")
     
     def search_patients(self, name: str = None, patient_id: int = None) -> List[Dict]:
         """Search patients by name or ID"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         if patient_id:
-            cursor.execute('''
-                SELECT patient_id, name, last_visit_date, visits_count
+            cursor.execute(f'''
+                SELECT {_PATIENT_COLUMNS}
                 FROM patients WHERE patient_id = ?
             ''', (patient_id,))
         elif name:
-            cursor.execute('''
-                SELECT patient_id, name, last_visit_date, visits_count
+            cursor.execute(f'''
+                SELECT {_PATIENT_COLUMNS}
                 FROM patients WHERE name LIKE ?
             ''', (f'%{name}%',))
         else:
-            cursor.execute('''
-                SELECT patient_id, name, last_visit_date, visits_count
+            cursor.execute(f'''
+                SELECT {_PATIENT_COLUMNS}
                 FROM patients ORDER BY name
             ''')
         
-        results = []
-        for row in cursor.fetchall():
-            patient_data = {
-                'patient_id': row[0],
-                'name': row[1],
-                'last_visit_date': row[2],
-                'visits_count': row[3],
-                'patient_type': 'new' if row[3] == 1 else 'returning'
-            }
-            results.append(patient_data)
-        
-        conn.close()
-        return results
+        return [dict(row) for row in cursor.fetchall()]
     
     def get_patient_by_id(self, patient_id: int) -> Optional[Dict]:
-        """Get patient by ID"""
-        results = self.search_patients(patient_id=patient_id)
-        return results[0] if results else None
+        """Get patient by ID with a single primary-key lookup"""
+        row = self._connect().execute(f'''
+            SELECT {_PATIENT_COLUMNS}
+            FROM patients WHERE patient_id = ?
+        ''', (patient_id,)).fetchone()
+        return dict(row) if row else None
     
     def add_patient(self, name: str, last_visit_date: date = None, visits_count: int = 1) -> int:
         """Add a new patient"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         if last_visit_date is None:
             last_visit_date = date.today()
         
-        cursor.execute('''
-            INSERT INTO patients (name, last_visit_date, visits_count)
-            VALUES (?, ?, ?)
-        ''', (name, last_visit_date, visits_count))
+        # The connection is long-lived, so a failed write must roll back rather
+        # than leave its transaction (and the write lock) open
+        with conn:
+            cursor.execute(_INSERT_PATIENT_SQL, (name, last_visit_date, visits_count))
         
         patient_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        self._invalidate('patient_statistics')
         
         return patient_id
     
     def update_patient_visit(self, patient_id: int):
         """Update patient's visit count and last visit date"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
-        cursor.execute('''
-            UPDATE patients 
-            SET visits_count = visits_count + 1, last_visit_date = ?
-            WHERE patient_id = ?
-        ''', (date.today(), patient_id))
+        with conn:
+            cursor.execute('''
+                UPDATE patients 
+                SET visits_count = visits_count + 1, last_visit_date = ?
+                WHERE patient_id = ?
+            ''', (date.today().isoformat(), patient_id))
         
-        conn.commit()
-        conn.close()
+        self._invalidate('patient_statistics')
     
     def get_all_patients(self) -> List[Dict]:
         """Get all patients"""
@@ -199,38 +278,38 @@ class SQLiteMedicalDatabase:
     
     def get_patient_statistics(self) -> Dict:
         """Get patient statistics"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Total patients
-        cursor.execute("SELECT COUNT(*) FROM patients")
-        total_patients = cursor.fetchone()[0]
-        
-        # New patients (visits_count = 1)
-        cursor.execute("SELECT COUNT(*) FROM patients WHERE visits_count = 1")
-        new_patients = cursor.fetchone()[0]
+        cached = self._cache_get('patient_statistics')
+        if cached is not None:
+            return dict(cached[0])
         
-        # Returning patients (visits_count > 1)
-        cursor.execute("SELECT COUNT(*) FROM patients WHERE visits_count > 1")
-        returning_patients = cursor.fetchone()[0]
-        
-        # Average visits
-        cursor.execute("SELECT AVG(visits_count) FROM patients")
-        avg_visits = cursor.fetchone()[0] or 0
+        conn = self._connect()
+        cursor = conn.cursor()
         
-        conn.close()
+        # Total, new (visits_count = 1) and returning (visits_count > 1) patients
+        # plus average visits, in one scan of the table
+        cursor.execute('''
+            SELECT COUNT(*),
+                   COALESCE(SUM(visits_count = 1), 0),
+                   COALESCE(SUM(visits_count > 1), 0),
+                   AVG(visits_count)
+            FROM patients
+        ''')
+        total_patients, new_patients, returning_patients, avg_visits = cursor.fetchone()
+        avg_visits = avg_visits or 0
         
-        return {
+        statistics = {
             'total_patients': total_patients,
             'new_patients': new_patients,
             'returning_patients': returning_patients,
             'average_visits': round(avg_visits, 2)
         }
+        self._cache_put('patient_statistics', statistics)
+        return dict(statistics)
     
     def add_doctor(self, doctor_id: str, first_name: str, last_name: str, 
                    specialty: str, phone: str, email: str, working_hours: str) -> bool:
         """Add a doctor"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         try:
@@ -241,15 +320,41 @@ class SQLiteMedicalDatabase:
             ''', (doctor_id, first_name, last_name, specialty, phone, email, working_hours))
             
             conn.commit()
-            conn.close()
+            self._invalidate('doctors')
             return True
         except Exception as e:
-            conn.close()
+            conn.rollback()
             return False
     
+    def add_doctors_bulk(self, doctors: List[Dict]) -> bool:
+        """Add several doctors in one transaction"""
+        conn = self._connect()
+        
+        # The connection context commits the batch, or rolls it back if an insert fails
+        try:
+            with conn:
+                conn.executemany('''
+                    INSERT OR REPLACE INTO doctors 
+                    (doctor_id, first_name, last_name, specialty, phone, email, working_hours)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', [
+                    (doctor["id"], doctor["first_name"], doctor["last_name"], doctor["specialty"],
+                     doctor["phone"], doctor["email"], doctor["working_hours"])
+                    for doctor in doctors
+                ])
+        except sqlite3.IntegrityError:
+            return False
+        
+        self._invalidate('doctors')
+        return True
+    
     def get_doctors(self) -> List[Dict]:
         """Get all doctors"""
-        conn = sqlite3.connect(self.db_path)
+        cached = self._cache_get('doctors')
+        if cached is not None:
+            return [dict(doctor) for doctor in cached[0]]
+        
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -257,47 +362,34 @@ class SQLiteMedicalDatabase:
             FROM doctors WHERE is_active = 1
         ''')
         
-        doctors = []
-        for row in cursor.fetchall():
-            doctor = {
-                'doctor_id': row[0],
-                'first_name': row[1],
-                'last_name': row[2],
-                'specialty': row[3],
-                'phone': row[4],
-                'email': row[5],
-                'working_hours': row[6]
-            }
-            doctors.append(doctor)
-        
-        conn.close()
-        return doctors
+        doctors = [dict(row) for row in cursor.fetchall()]
+        self._cache_put('doctors', doctors)
+        return [dict(doctor) for doctor in doctors]
     
     def add_appointment(self, patient_id: int, doctor_id: str, appointment_datetime: datetime,
                        appointment_type: str = "general", notes: str = "") -> int:
         """Add an appointment"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
-        cursor.execute('''
-            INSERT INTO appointments 
-            (patient_id, doctor_id, appointment_datetime, appointment_type, notes)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (patient_id, doctor_id, appointment_datetime, appointment_type, notes))
+        with conn:
+            cursor.execute('''
+                INSERT INTO appointments 
+                (patient_id, doctor_id, appointment_datetime, appointment_type, notes)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (patient_id, doctor_id, appointment_datetime, appointment_type, notes))
         
         appointment_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
         
         return appointment_id
     
     def get_appointments(self, patient_id: int = None, doctor_id: str = None) -> List[Dict]:
         """Get appointments"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         query = '''
-            SELECT a.appointment_id, a.patient_id, p.name, a.doctor_id, 
+            SELECT a.appointment_id, a.patient_id, p.name AS patient_name, a.doctor_id, 
                    a.appointment_datetime, a.status, a.appointment_type, a.notes
             FROM appointments a
             JOIN patients p ON a.patient_id = p.patient_id
@@ -315,40 +407,29 @@ class SQLiteMedicalDatabase:
         
         cursor.execute(query, params)
         
-        appointments = []
-        for row in cursor.fetchall():
-            appointment = {
-                'appointment_id': row[0],
-                'patient_id': row[1],
-                'patient_name': row[2],
-                'doctor_id': row[3],
-                'appointment_datetime': row[4],
-                'status': row[5],
-                'appointment_type': row[6],
-                'notes': row[7]
-            }
-            appointments.append(appointment)
-        
-        conn.close()
-        return appointments
+        return [dict(row) for row in cursor.fetchall()]
     
     def update_clinic_settings(self, clinic_name: str, address: str, phone: str, email: str, timezone: str = "Asia/Kolkata"):
         """Update clinic settings"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
-        cursor.execute('''
-            INSERT OR REPLACE INTO clinic_settings 
-            (id, clinic_name, address, phone, email, timezone)
-            VALUES (1, ?, ?, ?, ?, ?)
-        ''', (clinic_name, address, phone, email, timezone))
+        with conn:
+            cursor.execute('''
+                INSERT OR REPLACE INTO clinic_settings 
+                (id, clinic_name, address, phone, email, timezone)
+                VALUES (1, ?, ?, ?, ?, ?)
+            ''', (clinic_name, address, phone, email, timezone))
         
-        conn.commit()
-        conn.close()
+        self._invalidate('clinic_settings')
     
     def get_clinic_settings(self) -> Optional[Dict]:
         """Get clinic settings"""
-        conn = sqlite3.connect(self.db_path)
+        cached = self._cache_get('clinic_settings')
+        if cached is not None:
+            return dict(cached[0]) if cached[0] else None
+        
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -357,14 +438,6 @@ class SQLiteMedicalDatabase:
         ''')
         
         row = cursor.fetchone()
-        conn.close()
-        
-        if row:
-            return {
-                'clinic_name': row[0],
-                'address': row[1],
-                'phone': row[2],
-                'email': row[3],
-                'timezone': row[4]
-            }
-        return None
+        settings = dict(row) if row else None
+        self._cache_put('clinic_settings', settings)
+        return dict(settings) if settings else None
@@ -86,7 +86,7 @@ case "$cmd" in
     ;;
   agent)
     echo -e "${YELLOW}Starting MedAssist AI agent...${NC}"
-    "$PY" -c "import sys; sys.path.append('$PROJECT_ROOT'); import MedAssist_AI.agent as a; print('Agent loaded:', hasattr(a,'medassist_agent'))" | cat
+    "$PY" -c "import sys; sys.path.append('$PROJECT_ROOT'); from MedAssist_AI.notification_service import configure_logging; configure_logging(); import MedAssist_AI.agent as a; print('Agent loaded:', hasattr(a,'medassist_agent'))" | cat
     echo -e "${GREEN}Agent module is ready. Integrate via ADK or import MedAssist_AI.agent.medassist_agent in your app.${NC}"
     ;;
   status)